@@ -1,18 +1,214 @@
-import requests
-import urllib.parse
+import asyncio
+import aiohttp
+import httpx
+import ijson
+import logging
+import logging.handlers
+import orjson
 import os
+import queue
 from dotenv import load_dotenv
-import requests
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-def get_large_video_urls(
+BASE_URL = "https://pixabay.com/api/videos/"
+API_KEY = os.getenv("PIXABAY_API_KEY")
+if not API_KEY:
+    raise RuntimeError("PIXABAY_API_KEY 환경 변수가 설정되지 않았습니다.")
+BATCH_ENDPOINT = "http://49.143.34.88:5000/api/video/upload_url_batch"
+
+# 동시에 진행할 배치 업로드 요청 수 (업로드 워커 수)
+UPLOAD_CONCURRENCY = 2
+# 수집된 페이지(URL 배치)를 담아둘 큐의 최대 크기
+BATCH_QUEUE_SIZE = 4
+# 페이지별 수집 현황, 업로드 응답 본문까지 DEBUG 로그로 남길지 여부
+VERBOSE = os.getenv("AUTO_VIDEO_VERBOSE") == "1"
+# 로그 파일 경로 (크기 초과 시 회전)
+LOG_FILE = "auto_video.log"
+# 배치 업로드 요청 타임아웃 (서버는 큐 등록 후 바로 응답)
+UPLOAD_TIMEOUT = 30
+# 일시적인 오류(429/5xx, 네트워크 오류) 재시도 횟수와 백오프 계수 (0.3, 0.6, 1.2, ... 초)
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.3
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# 업로드 서버 큐가 가득 차 429를 받았을 때 Retry-After 헤더가 없으면 기다릴 시간(초)
+# 429는 서버가 살아 있고 큐가 비기를 기다리라는 뜻이므로 재시도 횟수 제한 없이 기다림
+QUEUE_FULL_WAIT = 60
+# 업로드 서버 연결 풀 크기 (워커 수만큼 keep-alive 연결 유지)
+UPLOAD_POOL_SIZE = UPLOAD_CONCURRENCY
+# 업로드에 성공한 URL 목록 파일 (재실행 시 이미 올린 URL은 건너뜀)
+SEEN_FILE = "uploaded_urls.json"
+
+# Pixabay 비디오 품질 확인 순서
+_QUALITY_ORDER = ("large", "medium", "small", "tiny")
+
+# Pixabay 비디오 카테고리 목록
+_CATEGORIES = (
+    "backgrounds", "fashion", "nature", "science", "education",
+    "feelings", "health", "people", "religion", "places",
+    "animals", "industry", "computer", "food", "sports",
+    "transportation", "travel", "buildings", "business", "music",
+)
+
+# Pixabay API 클라이언트 (HTTP/2, 이벤트 루프 안에서 최초 사용 시 생성)
+_pixabay_client = None
+
+
+def get_client():
+    """
+    Pixabay 요청에 사용하는 httpx 비동기 클라이언트를 반환합니다.
+
+    하나의 HTTP/2 연결로 여러 페이지 요청을 다중화하기 위해 모듈 단위로 재사용합니다.
+
+    Returns:
+        httpx.AsyncClient: 공유 클라이언트 객체
+    """
+    global _pixabay_client
+    if _pixabay_client is None or _pixabay_client.is_closed:
+        # transport를 직접 지정하면 클라이언트의 http2/limits 인자는 무시되므로 transport에 설정
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+        )
+        _pixabay_client = httpx.AsyncClient(transport=transport, timeout=10)
+    return _pixabay_client
+
+
+async def close_client():
+    """Pixabay 클라이언트를 닫습니다."""
+    global _pixabay_client
+    if _pixabay_client is not None:
+        await _pixabay_client.aclose()
+        _pixabay_client = None
+
+
+def setup_logging():
+    """
+    로그 기록을 QueueHandler로 받아 별도 스레드(QueueListener)에서 콘솔과 회전 파일에 씁니다.
+
+    이벤트 루프는 큐에 레코드를 넣기만 하므로 stdout/파일 쓰기로 막히지 않습니다.
+
+    Returns:
+        logging.handlers.QueueListener: 종료 시 stop()을 호출해야 하는 리스너
+    """
+    log_queue = queue.Queue(-1)
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=3, encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+
+    logging.basicConfig(
+        level=logging.DEBUG if VERBOSE else logging.INFO,
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+    )
+    # httpx는 요청마다 INFO 로그를 남기므로 VERBOSE가 아니면 경고 이상만 기록
+    if not VERBOSE:
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
+
+def _backoff_delay(attempt):
+    """재시도 전 대기 시간(초)을 계산합니다."""
+    return BACKOFF_FACTOR * (2 ** attempt)
+
+
+def _retry_after_delay(headers):
+    """Retry-After 헤더(초)를 읽어 대기 시간을 반환합니다. 없거나 해석할 수 없으면 QUEUE_FULL_WAIT를 사용합니다."""
+    try:
+        return max(float(headers.get("Retry-After")), 1.0)
+    except (TypeError, ValueError):
+        return QUEUE_FULL_WAIT
+
+
+def load_seen_urls():
+    """이전 실행에서 업로드한 URL 집합을 불러옵니다."""
+    try:
+        with open(SEEN_FILE, "rb") as f:
+            return set(orjson.loads(f.read()))
+    except FileNotFoundError:
+        return set()
+    except ValueError as e:
+        logger.warning("업로드 기록 파일 파싱 오류: %s", e)
+        return set()
+
+
+def save_seen_urls(urls):
+    """업로드한 URL 집합을 파일에 저장합니다."""
+    with open(SEEN_FILE, "wb") as f:
+        f.write(orjson.dumps(sorted(urls)))
+
+
+def _build_params(search_term, category, video_type, per_page, page):
+    """Pixabay API 요청 파라미터를 생성합니다."""
+    # params 값은 HTTP 클라이언트가 인코딩하므로 검색어를 그대로 전달
+    return {
+        "key": API_KEY,
+        "q": search_term,
+        "category": category,
+        "video_type": video_type,
+        "per_page": per_page,
+        "page": page,
+        "safesearch": "true",  # 안전 검색 활성화
+    }
+
+
+def _pick_hd_url(video):
+    """Pixabay 검색 결과 하나에서 1920x1080 해상도 비디오 URL을 찾습니다. 없으면 None을 반환합니다."""
+    videos = video.get("videos") or {}
+
+    # 대부분 large 품질이 1920x1080이므로 먼저 확인
+    cand = videos.get("large")
+    if isinstance(cand, dict):
+        if cand.get("width") == 1920 and cand.get("height") == 1080:
+            return cand.get("url")
+        # 품질 단계는 large > medium > small > tiny 순으로 해상도가 낮아지므로
+        # large가 1920 미만이면 나머지 품질도 1920x1080일 수 없음
+        if (cand.get("width") or 0) < 1920:
+            return None
+
+    # 나머지 품질 옵션을 순서대로 확인 (medium, small, tiny)
+    for quality in _QUALITY_ORDER[1:]:
+        cand = videos.get(quality)
+        if isinstance(cand, dict) and cand.get("width") == 1920 and cand.get("height") == 1080:
+            return cand.get("url")  # 하나의 영상에서 1920x1080을 찾으면 다른 품질은 확인하지 않음
+
+    return None
+
+
+class _AsyncStreamReader:
+    """httpx 응답 스트림을 ijson이 사용하는 비동기 read() 인터페이스로 감쌉니다."""
+
+    def __init__(self, resp):
+        self._chunks = resp.aiter_bytes()
+
+    async def read(self, size=-1):
+        # ijson은 빈 바이트를 스트림 끝으로 처리하므로 빈 청크는 건너뜀
+        async for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b""
+
+
+async def get_large_video_urls(
     search_term="", category="", video_type="film", per_page=20, page=1
 ):
     """
     Pixabay API를 사용해서 검색 결과 중 1920x1080 해상도 비디오 URL 리스트를 가져오는 함수
 
+    응답 전체를 메모리에 올려 파싱하지 않고, 받는 대로 hits 배열을 하나씩 파싱해 URL만 남깁니다.
+
     Args:
         search_term (str): 검색할 키워드
         per_page (int): 페이지당 결과 수 (3-200, 기본값: 20)
@@ -21,136 +217,259 @@ def get_large_video_urls(
     Returns:
         list: 1920x1080 해상도 비디오 URL 리스트
     """
-    API_KEY = os.getenv("PIXABAY_API_KEY")
-    BASE_URL = "https://pixabay.com/api/videos/"
+    params = _build_params(search_term, category, video_type, per_page, page)
 
-    # 검색어 URL 인코딩
-    encoded_search_term = urllib.parse.quote(search_term)
+    for attempt in range(MAX_RETRIES + 1):
+        hd_video_urls = []
+        retry_status = None
 
-    # API 요청 파라미터
-    params = {
-        "key": API_KEY,
-        "q": encoded_search_term,
-        "category": category,
-        "video_type": video_type,
-        "per_page": per_page,
-        "page": page,
-        "safesearch": "true",  # 안전 검색 활성화
-    }
+        try:
+            # API 요청 (스트리밍)
+            async with get_client().stream("GET", BASE_URL, params=params) as resp:
+                if resp.status_code in _RETRY_STATUSES and attempt < MAX_RETRIES:
+                    retry_status = resp.status_code
+                else:
+                    resp.raise_for_status()  # HTTP 에러 체크
+
+                    async for video in ijson.items_async(_AsyncStreamReader(resp), "hits.item"):
+                        url = _pick_hd_url(video)
+                        if url:  # URL이 비어있지 않은 경우만 추가
+                            hd_video_urls.append(url)
+
+                    return hd_video_urls
+
+        except httpx.TransportError as e:
+            if attempt == MAX_RETRIES:
+                logger.error("API 요청 오류: %s", e)
+                return []
+            retry_status = type(e).__name__
+        except httpx.HTTPError as e:
+            logger.error("API 요청 오류: %s", e)
+            return []
+        except Exception as e:
+            logger.error("처리 중 오류 발생: %s", e)
+            return []
+
+        # 연결을 반환한 뒤 대기 후 재시도
+        delay = _backoff_delay(attempt)
+        logger.warning("Pixabay 일시 오류(%s), %.1f초 후 재시도 (%d/%d)", retry_status, delay, attempt + 1, MAX_RETRIES)
+        await asyncio.sleep(delay)
+
+    return []
+
+
+async def upload_batch(session, urls):
+    """
+    비디오 URL 배치를 한 번의 요청으로 업로드 서버에 전송합니다.
+
+    성공 응답의 본문은 VERBOSE 모드일 때만 읽고, 그 외에는 상태 코드만 확인합니다.
+    서버 업로드 큐가 가득 차서 429를 받으면 Retry-After만큼 기다렸다가 같은 배치를 다시 보냅니다.
+    (이미 큐에 등록된 URL은 서버에서 중복으로 처리되므로 배치 전체를 다시 보내도 안전)
+    429 대기는 재시도 횟수에 포함하지 않습니다.
+
+    Args:
+        session (aiohttp.ClientSession): 공유 HTTP 세션
+        urls (list): 업로드할 비디오 URL 리스트
+
+    Returns:
+        bool: 요청 성공 여부
+    """
+    attempt = 0
+    while attempt <= MAX_RETRIES:
+        retry_reason = None
+
+        try:
+            async with session.post(
+                BATCH_ENDPOINT,
+                json={"urls": urls},
+                timeout=aiohttp.ClientTimeout(total=UPLOAD_TIMEOUT),
+            ) as res:
+                logger.debug("응답 상태 코드: %s", res.status)
+
+                if res.status == 429:
+                    delay = _retry_after_delay(res.headers)
+                    logger.info("업로드 서버 큐가 가득 찼습니다. %.0f초 후 다시 보냅니다.", delay)
+                    await asyncio.sleep(delay)
+                    continue
+                elif res.status in _RETRY_STATUSES and attempt < MAX_RETRIES:
+                    retry_reason = res.status
+                elif res.status != 200:
+                    logger.error("서버 오류: %s, 응답 내용: %s", res.status, await res.text())
+                    return False
+                else:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        # 응답 내용이 JSON인지 확인
+                        try:
+                            response_json = orjson.loads(await res.read())
+                            logger.debug("처리 결과: 총 %s개, 실패 %s개", response_json["count"], response_json["failed"])
+                        except ValueError as json_error:
+                            logger.warning("JSON 파싱 오류: %s", json_error)
+                    return True
+
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == MAX_RETRIES:
+                logger.error("네트워크 오류 발생: %s", e)
+                return False
+            retry_reason = type(e).__name__
+        except aiohttp.ClientError as e:
+            logger.error("네트워크 오류 발생: %s", e)
+            return False
+        except Exception as e:
+            logger.error("기타 오류 발생: %s", e)
+            return False
+
+        delay = _backoff_delay(attempt)
+        logger.warning("업로드 일시 오류(%s), %.1f초 후 재시도 (%d/%d)", retry_reason, delay, attempt + 1, MAX_RETRIES)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+    return False
+
+
+async def produce_urls(categories, url_queue, num_workers, seen):
+    """
+    카테고리별로 Pixabay 페이지를 순회하며 페이지 단위 URL 배치를 큐에 넣습니다.
+
+    페이지 간에 겹치는 URL과 이전 실행에서 업로드한 URL(seen)은 제외합니다.
+    큐가 가득 차면 업로드 워커가 따라올 때까지 대기하므로 메모리 사용량이 제한됩니다.
+    모든 페이지를 처리하면 워커 수만큼 종료 신호(None)를 넣습니다.
+    """
+    total_found = 0
 
     try:
-        # API 요청
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()  # HTTP 에러 체크
+        for category in categories:
+            logger.info("=== 카테고리: %s ===", category)
+            page = 1  # 각 카테고리마다 페이지 1부터 시작
 
-        data = response.json()
+            while True:
+                logger.debug("현재 카테고리: %s, 페이지: %d", category, page)
+                video_urls = await get_large_video_urls(category=category, per_page=100, page=page)
 
-        # 1920x1080 해상도 비디오 URL 리스트 추출
-        hd_video_urls = []
+                if not video_urls:
+                    logger.info("카테고리 '%s'에서 더 이상 비디오가 없습니다. 다음 카테고리로 이동합니다.", category)
+                    break
 
-        if "hits" in data:
-            for video in data["hits"]:
-                if "videos" in video:
-                    # 모든 비디오 품질 옵션을 확인 (large, medium, small, tiny)
-                    for quality in ["large", "medium", "small", "tiny"]:
-                        if quality in video["videos"]:
-                            video_info = video["videos"][quality]
-                            # 1920x1080 해상도인지 확인
-                            if (
-                                video_info.get("width") == 1920
-                                and video_info.get("height") == 1080
-                            ):
-                                url = video_info.get("url")
-                                if url:  # URL이 비어있지 않은 경우만 추가
-                                    hd_video_urls.append(url)
-                                    break  # 하나의 영상에서 1920x1080을 찾으면 다른 품질은 확인하지 않음
-
-        return hd_video_urls
-
-    except requests.exceptions.RequestException as e:
-        print(f"API 요청 오류: {e}")
-        return []
-    except Exception as e:
-        print(f"처리 중 오류 발생: {e}")
-        return []
+                logger.debug("페이지 %d: 가져온 비디오 개수 %d", page, len(video_urls))
 
+                # 이미 본 URL 제외 (같은 페이지 안의 중복도 함께 제거)
+                new_urls = []
+                for url in video_urls:
+                    if url in seen:
+                        continue
+                    seen.add(url)
+                    new_urls.append(url)
 
-# 사용 예시
-if __name__ == "__main__":
-    # 모든 카테고리 리스트
-    categories = [
-        "backgrounds", "fashion", "nature", "science", "education", 
-        "feelings", "health", "people", "religion", "places", 
-        "animals", "industry", "computer", "food", "sports", 
-        "transportation", "travel", "buildings", "business", "music"
-    ]
-    
-    # 시작할 카테고리 설정 (None이면 처음부터, 특정 카테고리명을 입력하면 해당 카테고리부터 시작)
-    start_category = "science"  # 예: "nature", "animals", "music" 등
-    
-    total_uploaded = 0
-    
+                if len(new_urls) < len(video_urls):
+                    logger.debug("중복 URL %d개 건너뜀", len(video_urls) - len(new_urls))
+
+                if new_urls:
+                    await url_queue.put(new_urls)
+
+                total_found += len(new_urls)
+                page += 1
+
+            logger.info("카테고리 '%s' 완료. 누적 수집 비디오 수: %d", category, total_found)
+    finally:
+        for _ in range(num_workers):
+            await url_queue.put(None)
+
+
+async def upload_worker(session, url_queue, counter, uploaded, failed):
+    """
+    큐에서 URL 배치를 꺼내 업로드합니다. None을 받으면 종료합니다.
+
+    업로드에 실패한 배치는 failed에 모아 두었다가 수집이 끝난 뒤 한 번 더 보냅니다.
+    """
+    while True:
+        urls = await url_queue.get()
+        try:
+            if urls is None:
+                return
+            if await upload_batch(session, urls):
+                counter["uploaded"] += len(urls)
+                uploaded.update(urls)
+            else:
+                failed.append(urls)
+            logger.info("누적 업로드 수: %d", counter["uploaded"])
+        finally:
+            url_queue.task_done()
+
+
+async def retry_failed_batches(session, failed, counter, uploaded):
+    """
+    실패한 배치를 한 번 더 업로드합니다.
+
+    그래도 실패한 URL은 uploaded에 기록하지 않으므로 다음 실행에서 다시 수집됩니다.
+    """
+    remaining = 0
+    for urls in failed:
+        if await upload_batch(session, urls):
+            counter["uploaded"] += len(urls)
+            uploaded.update(urls)
+        else:
+            remaining += len(urls)
+
+    if remaining:
+        logger.error("업로드하지 못한 URL %d개는 다음 실행에서 다시 시도합니다.", remaining)
+
+
+async def main(categories, start_category=None):
+    """
+    Pixabay 페이지 수집과 업로드를 asyncio.Queue로 연결된 파이프라인으로 실행합니다.
+
+    수집(producer)과 업로드(worker)가 동시에 진행되어 Pixabay API 지연이
+    업로드 작업 뒤로 숨겨집니다.
+    """
     # 시작 카테고리가 지정된 경우, 해당 카테고리부터 시작하도록 리스트 슬라이싱
     if start_category:
         if start_category in categories:
             start_index = categories.index(start_category)
             categories = categories[start_index:]
-            print(f"'{start_category}' 카테고리부터 시작합니다.")
+            logger.info("'%s' 카테고리부터 시작합니다.", start_category)
         else:
-            print(f"경고: '{start_category}' 카테고리를 찾을 수 없습니다. 처음부터 시작합니다.")
-            print(f"사용 가능한 카테고리: {', '.join(categories)}")
-    
-    for category in categories:
-        print(f"=== 카테고리: {category} ===")
-        page = 1  # 각 카테고리마다 페이지 1부터 시작
-        
-        while True:
-            print(f"현재 카테고리: {category}, 페이지: {page}")
-            video_urls = get_large_video_urls(category=category, per_page=100, page=page)
-
-            print(video_urls)
-
-            if not video_urls:
-                print(f"카테고리 '{category}'에서 더 이상 비디오가 없습니다. 다음 카테고리로 이동합니다.")
-                break
-                
-            print(f"가져온 비디오 개수: {len(video_urls)}")
-            print("--------------------------------")
-            
-            for i, url in enumerate(video_urls, 1):
-                try:
-                    res = requests.post(
-                        "http://49.143.34.88:5000/api/video/upload_url?url=" + url
-                    )
-                    print("index: ", total_uploaded + i)
-                    print(f"응답 상태 코드: {res.status_code}")
-                    
-                    # 응답 상태 코드 확인
-                    if res.status_code == 200:
-                        # 응답 내용이 JSON인지 확인
-                        try:
-                            response_json = res.json()
-                            print(response_json)
-                        except ValueError as json_error:
-                            print(f"JSON 파싱 오류: {json_error}")
-                            print(f"응답 내용: {res.text}")
-                    else:
-                        print(f"서버 오류: {res.status_code}")
-                        print(f"응답 내용: {res.text}")
-                        
-                except requests.exceptions.RequestException as e:
-                    print(f"네트워크 오류 발생: {e}")
-                except Exception as e:
-                    print(f"기타 오류 발생: {e}")
-                print("--------------------------------")
-                
-            total_uploaded += len(video_urls)
-            page += 1
-
-        print(f"카테고리 '{category}' 완료. 총 업로드된 비디오 수: {total_uploaded}")
-        print("=" * 50)
-
-    print(f"모든 카테고리 완료! 총 업로드된 비디오 수: {total_uploaded}")
-
-        # 너무 많은 요청을 방지하기 위해 잠깐 대기 (필요시)
-        # import time; time.sleep(1)
+            logger.warning("'%s' 카테고리를 찾을 수 없습니다. 처음부터 시작합니다.", start_category)
+            logger.warning("사용 가능한 카테고리: %s", ", ".join(categories))
+
+    connector = aiohttp.TCPConnector(
+        limit=UPLOAD_POOL_SIZE,
+        limit_per_host=UPLOAD_POOL_SIZE,
+        keepalive_timeout=60,
+    )
+    url_queue = asyncio.Queue(maxsize=BATCH_QUEUE_SIZE)
+    counter = {"uploaded": 0}
+
+    # 업로드에 성공한 URL만 기록하고, 수집 단계의 중복 확인에는 이번 실행에서 본 URL까지 포함
+    uploaded = load_seen_urls()
+    seen = set(uploaded)
+    logger.info("이전에 업로드한 URL 수: %d", len(uploaded))
+
+    failed = []
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        workers = [
+            asyncio.create_task(upload_worker(session, url_queue, counter, uploaded, failed))
+            for _ in range(UPLOAD_CONCURRENCY)
+        ]
+        try:
+            await produce_urls(categories, url_queue, len(workers), seen)
+            await asyncio.gather(*workers)
+            if failed:
+                logger.warning("업로드에 실패한 배치 %d개를 다시 보냅니다.", len(failed))
+                await retry_failed_batches(session, failed, counter, uploaded)
+        finally:
+            await close_client()
+            save_seen_urls(uploaded)
+
+    logger.info("모든 카테고리 완료! 총 업로드된 비디오 수: %d", counter["uploaded"])
+
+
+# 사용 예시
+if __name__ == "__main__":
+    # 시작할 카테고리 설정 (None이면 처음부터, 특정 카테고리명을 입력하면 해당 카테고리부터 시작)
+    start_category = "science"  # 예: "nature", "animals", "music" 등
+
+    listener = setup_logging()
+    try:
+        asyncio.run(main(_CATEGORIES, start_category))
+    finally:
+        listener.stop()
@@ -6,9 +6,24 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from src.routers import video, story, edit, tts_service
 import os
+import sys
+import logging
 
 # 태스크 큐 임포트
-from src.task_queue import get_task_queue
+from src.task_queue import get_task_queue, get_upload_queue
+from src.lib.embedding_cache import embedding_cache
+from src.db import flush_dbs
+from src.lib.embedding import warm_up_collection
+from src.lib.http import close_http_client
+import asyncio
+
+# 애플리케이션 로거 설정 (모듈별 logging.getLogger(__name__) 로거가 사용)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+# httpx는 요청마다 INFO 로그를 남기므로 경고 이상만 기록
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 app = FastAPI(
     title="Backend AI Video Generation API",
@@ -62,7 +77,17 @@ async def startup_event():
     task_queue = get_task_queue()
     task_queue.start_worker()
     
+    # URL 업로드 큐 워커 시작
+    get_upload_queue().start_worker()
+    
     print("✅ 태스크 큐 워커가 시작되었습니다.")
+    
+    # 벡터 DB 컬렉션과 인덱스 미리 로드 (이벤트 루프를 막지 않도록 스레드에서 실행)
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, warm_up_collection)
+        print("✅ 벡터 DB 인덱스를 불러왔습니다.")
+    except Exception as e:
+        print(f"⚠️ 벡터 DB 사전 로드 실패: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -73,6 +98,15 @@ async def shutdown_event():
     task_queue = get_task_queue()
     task_queue.stop_worker()
     
+    # URL 업로드 큐 워커 중지
+    get_upload_queue().stop_worker()
+    
+    # 메모리에 남아 있는 DB 쓰기 기록
+    flush_dbs()
+
+    # 공유 HTTP 클라이언트 연결 종료
+    await close_http_client()
+    
     print("✅ 태스크 큐 워커가 정리되었습니다.")
 
 @app.get("/")
@@ -84,13 +118,25 @@ def health_check():
     """헬스 체크 엔드포인트"""
     task_queue = get_task_queue()
     queue_status = task_queue.get_queue_status()
+    upload_status = get_upload_queue().get_queue_status()
     
     return {
         "status": "healthy",
         "task_queue_running": queue_status["is_running"],
         "pending_tasks": queue_status["pending"],
-        "processing_tasks": queue_status["processing"]
+        "processing_tasks": queue_status["processing"],
+        "pending_uploads": upload_status["pending"],
+        "processing_uploads": upload_status["processing"],
+        "embedding_cache": embedding_cache.stats()
     }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=5000)
+    # uvloop은 Windows를 지원하지 않으므로 Windows에서는 기본 asyncio 루프 사용
+    # 태스크 큐와 태스크 캐시가 프로세스 메모리에 있으므로 워커는 1개로 유지
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=5000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+    )
@@ -1,15 +1,163 @@
-from tinydb import TinyDB, Query
+from tinydb import TinyDB
+from tinydb.storages import Storage
+from tinydb.middlewares import CachingMiddleware
 import os
+import sys
 import json
+import sqlite3
+import threading
+import time
+import orjson
 from datetime import datetime
 
 # DB 디렉토리 생성
 os.makedirs('db', exist_ok=True)
 
+class ORJSONStorage(Storage):
+    """
+    orjson으로 직렬화하는 TinyDB 저장소입니다. 기존 JSONStorage와 같은 파일 형식을 사용합니다.
+    """
+
+    def __init__(self, path: str, access_mode: str = 'r+b'):
+        # 파일이 없으면 빈 파일 생성
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        self._handle = open(path, mode=access_mode)
+
+    def close(self):
+        self._handle.close()
+
+    def read(self):
+        self._handle.seek(0, os.SEEK_END)
+        if not self._handle.tell():
+            return None
+
+        self._handle.seek(0)
+        return orjson.loads(self._handle.read())
+
+    def write(self, data):
+        self.write_bytes(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+
+    def write_bytes(self, payload: bytes):
+        """이미 직렬화한 데이터를 파일에 기록합니다."""
+        self._handle.seek(0)
+        self._handle.write(payload)
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._handle.truncate()
+
+# URL 기록이 바뀐 뒤 파일에 기록하기까지 기다리는 시간(초). 그 사이의 변경은 한 번에 기록
+URL_DB_FLUSH_DELAY = 1.0
+
 # TinyDB 인스턴스 생성
-video_db = TinyDB('db/videos.json')
-task_db = TinyDB('db/tasks.json')  # 태스크 상태 저장용 DB
-video_url_db = TinyDB('db/video_urls.json')  # 비디오 URL 저장용 DB
+video_url_db = TinyDB('db/video_urls.json', storage=CachingMiddleware(ORJSONStorage))  # 비디오 URL 저장용 DB
+# 쓰기 횟수에 따른 자동 기록은 끄고, 아래 백그라운드 스레드가 잠금 밖에서 기록
+video_url_db.storage.WRITE_CACHE_SIZE = sys.maxsize
+
+# SQLite 연결 (영상 생성 기록 + 태스크 상태)
+# TinyDB는 매 작업마다 JSON 파일 전체를 다시 읽고 쓰므로 자주 갱신되는 데이터는 SQLite에 저장
+SQLITE_PATH = 'db/app.sqlite3'
+_conn = sqlite3.connect(SQLITE_PATH, check_same_thread=False)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.executescript("""
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_videos_created_at ON videos (created_at);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS video_descriptions (
+    fingerprint TEXT NOT NULL,
+    num_frames INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (fingerprint, num_frames)
+);
+""")
+# last_used 컬럼이 없던 이전 embeddings 테이블에 컬럼 추가 (기존 행은 0이므로 가장 먼저 정리됨)
+if 'last_used' not in {row[1] for row in _conn.execute("PRAGMA table_info(embeddings)")}:
+    _conn.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+_conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+_conn.commit()
+_db_lock = threading.Lock()  # 워커 스레드와 API 스레드가 같은 연결을 공유하므로 직렬화
+
+def _dumps(data: dict) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+# 영상 생성 기록에 저장하지 않을 벡터 필드 (Chroma에 이미 저장되어 있음)
+_VECTOR_KEYS = frozenset({'embedding', 'embeddings'})
+
+def _strip_vectors(value):
+    """
+    임베딩 벡터와 바이너리 데이터를 제외한 복사본을 반환합니다.
+
+    검색 결과 메타데이터를 그대로 video_infos에 담아도 기록이 커지지 않도록 합니다.
+    """
+    if isinstance(value, dict):
+        return {
+            k: _strip_vectors(v) for k, v in value.items()
+            if k not in _VECTOR_KEYS and not isinstance(v, (bytes, bytearray, memoryview))
+            and not hasattr(v, '__array__')
+        }
+    if isinstance(value, (list, tuple)):
+        return [_strip_vectors(v) for v in value]
+    return value
+
+def _video_row_to_record(row):
+    record_id, created_at, data = row
+    return {**orjson.loads(data), 'id': record_id, 'created_at': created_at}
+
+def _task_row_to_record(row):
+    task_id, created_at, updated_at, data = row
+    return {**orjson.loads(data), 'task_id': task_id, 'created_at': created_at, 'updated_at': updated_at}
+
+def _import_legacy_tinydb():
+    """
+    기존 TinyDB JSON 파일(db/videos.json, db/tasks.json)의 데이터를 SQLite로 한 번 옮깁니다.
+
+    테이블이 비어 있을 때만 실행되며, 기존 레코드 ID를 그대로 유지합니다.
+    """
+    with _db_lock, _conn:
+        if _conn.execute("SELECT 1 FROM videos LIMIT 1").fetchone() is None and os.path.exists('db/videos.json'):
+            with open('db/videos.json', 'rb') as f:
+                table = orjson.loads(f.read() or b'{}').get('_default', {})
+            _conn.executemany(
+                "INSERT INTO videos (id, created_at, data) VALUES (?, ?, ?)",
+                [
+                    (int(doc_id), record.pop('created_at', ''), _dumps(record))
+                    for doc_id, record in table.items()
+                ]
+            )
+
+        if _conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() is None and os.path.exists('db/tasks.json'):
+            with open('db/tasks.json', 'rb') as f:
+                table = orjson.loads(f.read() or b'{}').get('_default', {})
+            _conn.executemany(
+                "INSERT OR REPLACE INTO tasks (task_id, created_at, updated_at, data) VALUES (?, ?, ?, ?)",
+                [
+                    (record.pop('task_id'), record.pop('created_at', ''), record.pop('updated_at', ''), _dumps(record))
+                    for record in table.values()
+                    if record.get('task_id')
+                ]
+            )
+
+_import_legacy_tinydb()
 
 def save_video_generation_info(output_path, video_infos, story_request=None, generation_options=None):
     """
@@ -26,22 +174,48 @@ def save_video_generation_info(output_path, video_infos, story_request=None, gen
     """
     record = {
         'output_path': output_path,
-        'created_at': datetime.now().isoformat(),
-        'video_infos': video_infos,
+        'video_infos': _strip_vectors(video_infos),  # 임베딩 벡터는 제외 (Chroma ID로 참조)
         'story_request': story_request,  # 원본 인풋 데이터 저장
         'generation_options': generation_options  # 생성 옵션들 저장
     }
     
-    return video_db.insert(record)
+    with _db_lock, _conn:
+        cursor = _conn.execute(
+            "INSERT INTO videos (created_at, data) VALUES (?, ?)",
+            (datetime.now().isoformat(), _dumps(record))
+        )
+    return cursor.lastrowid
 
-def get_video_generation_history():
+def get_video_generation_history(limit=None, offset=0):
     """
-    저장된 모든 영상 생성 기록을 가져옵니다.
+    저장된 영상 생성 기록을 최신순(created_at 내림차순)으로 가져옵니다.
+
+    정렬과 offset/limit은 created_at 인덱스를 사용해 SQLite에서 처리하므로
+    필요한 페이지의 레코드만 읽고 역직렬화합니다.
+    
+    Args:
+        limit (int, optional): 가져올 최대 기록 수 (None이면 전체)
+        offset (int): 건너뛸 기록 수
     
     Returns:
-        list: 영상 생성 기록 리스트
+        list: 영상 생성 기록 리스트 (각 기록에 'id' 포함)
     """
-    return video_db.all()
+    with _db_lock:
+        rows = _conn.execute(
+            "SELECT id, created_at, data FROM videos ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset or 0)
+        ).fetchall()
+    return [_video_row_to_record(row) for row in rows]
+
+def count_video_generations():
+    """
+    저장된 영상 생성 기록 수를 반환합니다.
+    
+    Returns:
+        int: 전체 기록 수
+    """
+    with _db_lock:
+        return _conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
 
 def get_video_generation_by_id(record_id):
     """
@@ -53,10 +227,137 @@ def get_video_generation_by_id(record_id):
     Returns:
         dict: 영상 생성 기록 또는 None
     """
-    return video_db.get(doc_id=record_id)
+    with _db_lock:
+        row = _conn.execute(
+            "SELECT id, created_at, data FROM videos WHERE id = ?", (record_id,)
+        ).fetchone()
+    return _video_row_to_record(row) if row else None
+
+def delete_video_generation(record_id):
+    """
+    특정 ID의 영상 생성 기록을 삭제합니다.
+    
+    Args:
+        record_id (int): 삭제할 레코드 ID
+    
+    Returns:
+        bool: 삭제 성공 여부
+    """
+    with _db_lock, _conn:
+        cursor = _conn.execute("DELETE FROM videos WHERE id = ?", (record_id,))
+    return cursor.rowcount > 0
+
+def next_counter(name: str, floor: int = 1) -> int:
+    """
+    이름별 카운터를 1 증가시키고 새 값을 반환합니다.
+
+    증가는 한 트랜잭션 안에서 처리되므로 여러 스레드나 프로세스가 같은 값을 받지 않습니다.
+
+    Args:
+        name (str): 카운터 이름
+        floor (int): 반환값의 최솟값 (카운터가 없으면 이 값으로 시작)
+
+    Returns:
+        int: 증가된 카운터 값
+    """
+    with _db_lock, _conn:
+        cursor = _conn.execute(
+            "UPDATE counters SET value = MAX(value + 1, ?) WHERE name = ?", (floor, name)
+        )
+        if cursor.rowcount == 0:
+            _conn.execute("INSERT INTO counters (name, value) VALUES (?, ?)", (name, floor))
+            return floor
+        return _conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+def pop_video_generation(record_id):
+    """
+    특정 ID의 영상 생성 기록을 삭제하고, 삭제된 기록을 반환합니다.
+
+    조회와 삭제를 한 트랜잭션에서 처리하므로 삭제 전에 따로 조회하지 않아도 됩니다.
+    
+    Args:
+        record_id (int): 삭제할 레코드 ID
+    
+    Returns:
+        dict: 삭제된 영상 생성 기록 또는 None (기록이 없는 경우)
+    """
+    with _db_lock, _conn:
+        row = _conn.execute(
+            "SELECT id, created_at, data FROM videos WHERE id = ?", (record_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        _conn.execute("DELETE FROM videos WHERE id = ?", (record_id,))
+    return _video_row_to_record(row)
 
 # === 태스크 관리 함수들 ===
 
+class TaskStore:
+    """
+    태스크 정보를 task_id 기준으로 메모리에 캐시하고, 변경 사항은 SQLite에 바로 기록(write-through)합니다.
+
+    큐 워커와 상태 조회 API가 같은 태스크를 반복해서 읽으므로 조회는 캐시에서 처리합니다.
+    """
+
+    _META_KEYS = ('task_id', 'created_at', 'updated_at')
+
+    def __init__(self):
+        self._cache: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """프로세스 시작 시 모든 태스크를 한 번 읽어 캐시에 올립니다."""
+        with _db_lock:
+            rows = _conn.execute("SELECT task_id, created_at, updated_at, data FROM tasks").fetchall()
+        with self._lock:
+            self._cache = {row[0]: _task_row_to_record(row) for row in rows}
+
+    def _write(self, record: dict):
+        data = {k: v for k, v in record.items() if k not in self._META_KEYS}
+        with _db_lock, _conn:
+            _conn.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, created_at, updated_at, data) VALUES (?, ?, ?, ?)",
+                (record['task_id'], record['created_at'], record['updated_at'], _dumps(data))
+            )
+
+    def save(self, task_id: str, task_data: dict):
+        now = datetime.now().isoformat()
+        record = {**task_data, 'task_id': task_id, 'created_at': now, 'updated_at': now}
+        with self._lock:
+            self._write(record)
+            self._cache[task_id] = record
+
+    def update(self, task_id: str, update_data: dict) -> bool:
+        with self._lock:
+            current = self._cache.get(task_id)
+            if current is None:
+                return False
+            record = {**current, **update_data, 'task_id': task_id, 'updated_at': datetime.now().isoformat()}
+            self._write(record)
+            self._cache[task_id] = record
+        return True
+
+    def get(self, task_id: str):
+        with self._lock:
+            record = self._cache.get(task_id)
+            # 호출하는 쪽에서 수정해도 캐시가 바뀌지 않도록 복사본 반환
+            return dict(record) if record is not None else None
+
+    def all(self):
+        with self._lock:
+            return [dict(record) for record in self._cache.values()]
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            if self._cache.pop(task_id, None) is None:
+                return False
+            with _db_lock, _conn:
+                _conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        return True
+
+task_store = TaskStore()
+
 def save_task_info(task_id: str, task_data: dict):
     """
     태스크 정보를 DB에 저장합니다.
@@ -66,16 +367,10 @@ def save_task_info(task_id: str, task_data: dict):
         task_data (dict): 태스크 데이터
     
     Returns:
-        int: 저장된 레코드의 ID
+        str: 저장된 태스크 ID
     """
-    record = {
-        'task_id': task_id,
-        'created_at': datetime.now().isoformat(),
-        'updated_at': datetime.now().isoformat(),
-        **task_data
-    }
-    
-    return task_db.insert(record)
+    task_store.save(task_id, task_data)
+    return task_id
 
 def update_task_info(task_id: str, update_data: dict):
     """
@@ -88,11 +383,7 @@ def update_task_info(task_id: str, update_data: dict):
     Returns:
         bool: 업데이트 성공 여부
     """
-    Task = Query()
-    update_data['updated_at'] = datetime.now().isoformat()
-    
-    result = task_db.update(update_data, Task.task_id == task_id)
-    return len(result) > 0
+    return task_store.update(task_id, update_data)
 
 def get_task_info(task_id: str):
     """
@@ -104,8 +395,7 @@ def get_task_info(task_id: str):
     Returns:
         dict: 태스크 정보 또는 None
     """
-    Task = Query()
-    return task_db.get(Task.task_id == task_id)
+    return task_store.get(task_id)
 
 def get_all_tasks():
     """
@@ -114,7 +404,7 @@ def get_all_tasks():
     Returns:
         list: 태스크 정보 리스트
     """
-    return task_db.all()
+    return task_store.all()
 
 def delete_task_info(task_id: str):
     """
@@ -126,12 +416,141 @@ def delete_task_info(task_id: str):
     Returns:
         bool: 삭제 성공 여부
     """
-    Task = Query()
-    result = task_db.remove(Task.task_id == task_id)
-    return len(result) > 0
+    return task_store.delete(task_id)
+
+# === 비디오 설명 캐시 함수들 ===
+
+def get_video_description(fingerprint: str, num_frames: int):
+    """
+    같은 영상에 대해 저장된 설명 텍스트를 가져옵니다.
+    
+    Args:
+        fingerprint (str): 영상 내용 지문
+        num_frames (int): 설명 생성에 사용한 프레임 수
+    
+    Returns:
+        str: 저장된 설명 텍스트 또는 None
+    """
+    with _db_lock:
+        row = _conn.execute(
+            "SELECT text FROM video_descriptions WHERE fingerprint = ? AND num_frames = ?",
+            (fingerprint, num_frames)
+        ).fetchone()
+    return row[0] if row else None
+
+def save_video_description(fingerprint: str, num_frames: int, text: str):
+    """
+    영상 설명 텍스트를 저장합니다.
+    
+    Args:
+        fingerprint (str): 영상 내용 지문
+        num_frames (int): 설명 생성에 사용한 프레임 수
+        text (str): 설명 텍스트
+    """
+    with _db_lock, _conn:
+        _conn.execute(
+            "INSERT OR REPLACE INTO video_descriptions (fingerprint, num_frames, text, created_at) VALUES (?, ?, ?, ?)",
+            (fingerprint, num_frames, text, datetime.now().isoformat())
+        )
+
+# === 임베딩 캐시 함수들 ===
+
+# 한 번의 IN (...) 조회에 넣을 최대 키 수 (SQLite 바인딩 변수 제한 이하)
+_EMBEDDING_LOOKUP_CHUNK = 500
+
+# 저장할 최대 임베딩 수 (3072차원 float32 기준 약 12KB씩, 넘으면 가장 오래 사용하지 않은 것부터 삭제)
+EMBEDDING_DB_MAX_ROWS = 5000
+
+def get_cached_embeddings(keys: list):
+    """
+    저장된 임베딩 벡터를 가져오고, 찾은 항목의 마지막 사용 시각을 갱신합니다.
+    
+    Args:
+        keys (list[bytes]): 임베딩 캐시 키 리스트
+    
+    Returns:
+        dict: 키 -> float32 벡터 bytes (저장된 키만 포함)
+    """
+    found = {}
+    with _db_lock:
+        for start in range(0, len(keys), _EMBEDDING_LOOKUP_CHUNK):
+            chunk = keys[start:start + _EMBEDDING_LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(_conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        if found:
+            now = time.time()
+            with _conn:
+                _conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+    return found
+
+def save_cached_embeddings(items: list):
+    """
+    임베딩 벡터를 저장합니다. 저장 개수가 EMBEDDING_DB_MAX_ROWS를 넘으면
+    가장 오래 사용하지 않은 항목부터 삭제합니다.
+    
+    Args:
+        items (list[tuple[bytes, bytes]]): (임베딩 캐시 키, float32 벡터 bytes) 리스트
+    """
+    if not items:
+        return
+    now = time.time()
+    with _db_lock, _conn:
+        _conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, vector, now) for key, vector in items]
+        )
+        _conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (EMBEDDING_DB_MAX_ROWS,)
+        )
 
 # === 비디오 URL 관리 함수들 ===
 
+# URL -> doc_id 목록 인덱스 (전체 스캔 없이 중복 확인/삭제)
+# TinyDB는 스레드 안전하지 않으므로 업로드 워커와 API 스레드의 접근을 잠금으로 직렬화
+_url_lock = threading.Lock()
+_url_index: dict[str, list[int]] = {}
+for _record in video_url_db.all():
+    _url_index.setdefault(_record['url'], []).append(_record.doc_id)
+
+_url_write_lock = threading.Lock()  # 파일 기록 순서 보장 (먼저 만든 스냅샷이 나중 것을 덮어쓰지 않도록)
+_url_flush_event = threading.Event()
+
+def _flush_url_db():
+    """
+    메모리에 있는 URL 기록을 파일에 기록합니다.
+
+    _url_lock 안에서는 직렬화만 하고, 파일 쓰기와 fsync는 잠금 밖에서 하므로
+    기록하는 동안에도 URL 조회(check_url_exists)가 기다리지 않습니다.
+    """
+    storage = video_url_db.storage
+    with _url_write_lock:
+        with _url_lock:
+            if not storage._cache_modified_count:
+                return
+            payload = orjson.dumps(storage.cache, option=orjson.OPT_NON_STR_KEYS)
+            storage._cache_modified_count = 0
+        storage.storage.write_bytes(payload)
+
+def _url_flush_loop():
+    """URL 기록이 바뀌면 URL_DB_FLUSH_DELAY초 동안 모인 변경을 한 번에 파일에 기록합니다."""
+    while True:
+        _url_flush_event.wait()
+        time.sleep(URL_DB_FLUSH_DELAY)
+        _url_flush_event.clear()
+        try:
+            _flush_url_db()
+        except Exception as e:
+            print(f"URL DB 기록 중 오류: {e}")
+
+threading.Thread(target=_url_flush_loop, daemon=True).start()
+
 def save_video_url(url: str, file_name: str, metadata: dict = None):
     """
     비디오 URL 정보를 DB에 저장합니다.
@@ -151,7 +570,11 @@ def save_video_url(url: str, file_name: str, metadata: dict = None):
         'metadata': metadata or {}
     }
     
-    return video_url_db.insert(record)
+    with _url_lock:
+        doc_id = video_url_db.insert(record)
+        _url_index.setdefault(url, []).append(doc_id)
+    _url_flush_event.set()
+    return doc_id
 
 def check_url_exists(url: str):
     """
@@ -163,8 +586,11 @@ def check_url_exists(url: str):
     Returns:
         dict: 기존 레코드 정보 또는 None
     """
-    UrlQuery = Query()
-    return video_url_db.get(UrlQuery.url == url)
+    with _url_lock:
+        doc_ids = _url_index.get(url)
+        if not doc_ids:
+            return None
+        return video_url_db.get(doc_id=doc_ids[0])
 
 def get_all_video_urls():
     """
@@ -173,7 +599,8 @@ def get_all_video_urls():
     Returns:
         list: 비디오 URL 정보 리스트
     """
-    return video_url_db.all()
+    with _url_lock:
+        return video_url_db.all()
 
 def delete_video_url(url: str):
     """
@@ -185,6 +612,18 @@ def delete_video_url(url: str):
     Returns:
         bool: 삭제 성공 여부
     """
-    UrlQuery = Query()
-    result = video_url_db.remove(UrlQuery.url == url)
-    return len(result) > 0
+    with _url_lock:
+        doc_ids = _url_index.pop(url, None)
+        if not doc_ids:
+            return False
+        video_url_db.remove(doc_ids=doc_ids)
+    _url_flush_event.set()
+    return True
+
+def flush_dbs():
+    """
+    메모리에 모아 둔 TinyDB 쓰기를 바로 파일에 기록합니다.
+
+    평소에는 백그라운드 스레드가 변경 후 URL_DB_FLUSH_DELAY초 안에 기록하며, 애플리케이션 종료 시 호출합니다.
+    """
+    _flush_url_db()
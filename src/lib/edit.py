@@ -1,73 +1,462 @@
-from moviepy import (
-    VideoFileClip,
-    TextClip,
-    CompositeVideoClip,
-    concatenate_videoclips,
-    AudioFileClip
-)
-from moviepy.video import fx
+from moviepy.config import FFMPEG_BINARY
+from PIL import Image, ImageDraw, ImageFont
+import av
 import os
 import gc
-import psutil
+import hashlib
+import shutil
+import uuid
+import atexit
 import signal
 import subprocess
-import time
 import threading
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-# FFmpeg 프로세스 관리를 위한 전역 변수
-_active_processes = set()
+# FFmpeg 프로세스 관리를 위한 전역 변수 (이 프로세스가 실행한 FFmpeg만 추적)
+_active_processes: set[subprocess.Popen] = set()
 _process_lock = threading.Lock()
 
+# 자막 스타일
+CAPTION_FONT = "fonts/NotoSansKR-Medium.ttf"
+CAPTION_FONT_SIZE = 48
+CAPTION_STROKE_WIDTH = 3
+CAPTION_MARGIN = 40  # 자막 좌우 여백 (px)
+
+# 렌더링한 자막 PNG 캐시 (같은 자막으로 다시 생성할 때 재사용)
+CAPTION_CACHE_DIR = "caption_cache"
+CAPTION_CACHE_MAX_FILES = 500
+
+# 모든 중간 파일에 공통으로 적용하는 오디오 형식 (concat 시 재인코딩 없이 이어 붙이기 위함)
+_AUDIO_FORMAT = "aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo,apad"
+
 def kill_ffmpeg_processes():
-    """남아있는 FFmpeg 프로세스들을 강제 종료합니다."""
-    try:
-        for proc in psutil.process_iter(['pid', 'name']):
-            if proc.info['name'] and 'ffmpeg' in proc.info['name'].lower():
-                try:
-                    proc.kill()
-                    print(f"FFmpeg 프로세스 종료: PID {proc.info['pid']}")
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-    except Exception as e:
-        print(f"FFmpeg 프로세스 정리 중 오류: {e}")
+    """이 프로세스가 실행한 FFmpeg 중 아직 실행 중인 프로세스들을 종료합니다."""
+    with _process_lock:
+        processes = list(_active_processes)
+
+    for proc in processes:
+        if proc.poll() is not None:
+            continue
+        try:
+            proc.terminate()
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        except Exception as e:
+            print(f"FFmpeg 프로세스 정리 중 오류: {e}")
+            continue
+        print(f"FFmpeg 프로세스 종료: PID {proc.pid}")
+
+# 서버 종료 시 남은 FFmpeg 프로세스 정리
+atexit.register(kill_ffmpeg_processes)
+
+def probe_media(path: str) -> dict:
+    """
+    PyAV로 컨테이너 헤더만 읽어 미디어 정보를 확인합니다. (프레임 디코딩, 하위 프로세스 없음)
+
+    Args:
+        path (str): 비디오 또는 오디오 파일 경로
+
+    Returns:
+        dict: duration (초), size ((width, height), 비디오가 없으면 None), rotation (회전 메타데이터, 도),
+              has_video, has_audio
+    """
+    with av.open(path) as container:
+        video = container.streams.video[0] if container.streams.video else None
+        audio = container.streams.audio[0] if container.streams.audio else None
+
+        if container.duration is not None:
+            duration = container.duration / av.time_base
+        else:
+            stream = video or audio
+            duration = float(stream.duration * stream.time_base) if stream and stream.duration else 0.0
+
+        size = (video.codec_context.width, video.codec_context.height) if video else None
+        # 휴대폰 영상은 가로로 저장하고 회전 메타데이터로 세로 표시하는 경우가 있음
+        rotation = int(video.metadata.get("rotate", 0) or 0) % 360 if video else 0
+
+    return {
+        "duration": duration,
+        "size": size,
+        "rotation": rotation,
+        "has_video": video is not None,
+        "has_audio": audio is not None,
+    }
+
+def get_display_size(path: str):
+    """
+    회전 메타데이터를 반영해 화면에 표시되는 영상 크기를 반환합니다.
+
+    Args:
+        path (str): 비디오 파일 경로
+
+    Returns:
+        tuple: (width, height), 비디오 스트림이 없으면 None
+    """
+    return display_size(probe_media(path))
+
+def display_size(info: dict):
+    """
+    probe_media 결과에서 회전 메타데이터를 반영한 화면 표시 크기를 계산합니다.
+
+    Args:
+        info (dict): probe_media 결과
+
+    Returns:
+        tuple: (width, height), 비디오 스트림이 없으면 None
+    """
+    if not info["size"]:
+        return None
+    width, height = info["size"]
+    # 90/270도 회전 메타데이터가 있으면 화면에 표시되는 가로/세로가 바뀜
+    if info["rotation"] in (90, 270):
+        width, height = height, width
+    return width, height
+
+def _run_ffmpeg(args: list[str]):
+    """FFmpeg를 실행하고, 실패하면 FFmpeg 오류 메시지를 포함한 예외를 발생시킵니다."""
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", *args]
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    with _process_lock:
+        _active_processes.add(proc)
 
-@contextmanager
-def managed_clip(clip):
-    """클립 자원을 안전하게 관리하는 컨텍스트 매니저"""
     try:
-        yield clip
+        _, stderr = proc.communicate()
     finally:
+        # 예외로 빠져나가는 경우에도 프로세스를 남기지 않음
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        with _process_lock:
+            _active_processes.discard(proc)
+
+    if proc.returncode != 0:
+        stderr = stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"FFmpeg 실행 실패 (code {proc.returncode}): {stderr[-1000:]}")
+
+# 하드웨어 H.264 인코더 후보 (우선순위 순) 와 인코딩 옵션
+_HW_ENCODERS = (
+    ("h264_nvenc", ["-preset", "p4", "-rc", "vbr", "-cq", "23", "-b:v", "0"]),
+    ("h264_qsv", ["-preset", "veryfast", "-global_quality", "23"]),
+    ("h264_videotoolbox", ["-b:v", "8M"]),
+)
+# 소프트웨어 인코더 옵션 (하드웨어 인코더가 없을 때 사용)
+_SW_ENCODER = ("libx264", ["-preset", "veryfast", "-crf", "23"])
+# 하드웨어 인코더 동시 세션 수 제한 (소비자용 GPU는 동시 인코딩 세션 수가 제한됨)
+HW_ENCODER_MAX_SESSIONS = 3
+
+@lru_cache(maxsize=1)
+def get_video_encoder() -> tuple[str, list[str]]:
+    """
+    사용할 H.264 인코더와 옵션을 선택합니다. 결과는 프로세스 단위로 캐시됩니다.
+
+    FFmpeg 빌드에 포함되어 있어도 장치가 없으면 사용할 수 없으므로, 후보 인코더로
+    짧은 테스트 인코딩을 실행해 실제로 동작하는 첫 번째 인코더를 사용합니다.
+    환경 변수 VIDEO_ENCODER로 인코더 이름을 직접 지정할 수 있습니다 (예: libx264).
+
+    Returns:
+        tuple: (인코더 이름, 인코더 옵션 리스트)
+    """
+    candidates = _HW_ENCODERS + (_SW_ENCODER,)
+    forced = os.getenv("VIDEO_ENCODER")
+    if forced:
+        for name, options in candidates:
+            if name == forced:
+                return name, options
+        return forced, []
+
+    try:
+        result = subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=10,
+        )
+        available = result.stdout.decode("utf-8", errors="replace")
+    except Exception as e:
+        print(f"⚠️ FFmpeg 인코더 목록 확인 실패: {e}")
+        return _SW_ENCODER
+
+    for name, options in _HW_ENCODERS:
+        if name not in available:
+            continue
         try:
-            if hasattr(clip, 'close'):
-                clip.close()
-        except Exception as e:
-            print(f"클립 해제 중 오류: {e}")
+            test = subprocess.run(
+                [
+                    FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+                    "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+                    "-pix_fmt", "yuv420p", "-c:v", name, *options, "-f", "null", "-",
+                ],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=20,
+            )
+        except Exception:
+            continue
+        if test.returncode == 0:
+            print(f"🚀 하드웨어 인코더 사용: {name}")
+            return name, options
 
-def safe_close_clip(clip):
-    """클립을 안전하게 해제합니다."""
-    if clip is None:
-        return
-    
+    print("💻 소프트웨어 인코더 사용: libx264")
+    return _SW_ENCODER
+
+@lru_cache(maxsize=8)
+def _caption_font(size: int = CAPTION_FONT_SIZE):
+    """자막 폰트를 한 번만 읽어 재사용합니다. (CJK 폰트 파일은 크기가 커서 매번 읽으면 느림)"""
+    return ImageFont.truetype(CAPTION_FONT, size)
+
+def _wrap_caption(draw: ImageDraw.ImageDraw, text: str, font, max_width: int) -> list[str]:
+    """자막 텍스트를 최대 너비에 맞게 단어 단위로 줄바꿈합니다."""
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if not line or draw.textlength(candidate, font=font) <= max_width:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+def _render_caption(text: str, output_path: str, max_width: int) -> str:
+    """
+    자막을 테두리가 있는 흰색 글씨의 투명 PNG로 렌더링합니다.
+
+    Args:
+        text (str): 자막 텍스트
+        output_path (str): PNG 저장 경로
+        max_width (int): 자막 최대 너비 (px)
+
+    Returns:
+        str: 저장된 PNG 경로
+    """
+    font = _caption_font()
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    wrapped = "\n".join(_wrap_caption(measure, text, font, max_width))
+
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), wrapped, font=font, align="center", stroke_width=CAPTION_STROKE_WIDTH
+    )
+    image = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(image).multiline_text(
+        (-left, -top),
+        wrapped,
+        font=font,
+        fill="white",
+        stroke_width=CAPTION_STROKE_WIDTH,  # 검정 테두리
+        stroke_fill="black",
+        align="center",
+    )
+    image.save(output_path)
+    return output_path
+
+def _cached_caption(text: str, max_width: int) -> str:
+    """
+    자막 PNG를 캐시에서 찾고, 없으면 렌더링해 캐시에 저장합니다.
+
+    캐시 키는 자막 텍스트와 스타일(폰트, 크기, 테두리, 너비)의 해시입니다.
+    파일 수가 CAPTION_CACHE_MAX_FILES를 넘으면 가장 오래 사용하지 않은 파일부터 삭제합니다.
+
+    Args:
+        text (str): 자막 텍스트
+        max_width (int): 자막 최대 너비 (px)
+
+    Returns:
+        str: 자막 PNG 경로
+    """
+    os.makedirs(CAPTION_CACHE_DIR, exist_ok=True)
+    key = hashlib.blake2b(
+        f"{text}|{max_width}|{CAPTION_FONT_SIZE}|{CAPTION_STROKE_WIDTH}|{CAPTION_FONT}".encode("utf-8"),
+        digest_size=8,
+    ).hexdigest()
+    path = os.path.join(CAPTION_CACHE_DIR, f"cap_{key}.png")
+
+    if os.path.exists(path):
+        # 사용 시각 갱신 (LRU 정리 기준)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    # 병렬로 같은 자막을 렌더링해도 깨진 파일이 보이지 않도록 임시 파일에 쓴 뒤 교체
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp.png"
+    _render_caption(text, temp_path, max_width)
+    os.replace(temp_path, path)
+
+    _evict_caption_cache()
+    return path
+
+def _evict_caption_cache():
+    """자막 캐시 파일 수가 제한을 넘으면 오래 사용하지 않은 파일부터 삭제합니다."""
     try:
-        # 오디오가 있는 경우 먼저 해제
-        if hasattr(clip, 'audio') and clip.audio is not None:
+        entries = [
+            entry for entry in os.scandir(CAPTION_CACHE_DIR)
+            if entry.is_file() and entry.name.startswith("cap_") and not entry.name.endswith(".tmp.png")
+        ]
+        if len(entries) <= CAPTION_CACHE_MAX_FILES:
+            return
+
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - CAPTION_CACHE_MAX_FILES]:
             try:
-                clip.audio.close()
-            except:
+                os.remove(entry.path)
+            except OSError:
                 pass
-        
-        # 클립 자체 해제
-        if hasattr(clip, 'close'):
-            clip.close()
+    except OSError as e:
+        print(f"자막 캐시 정리 중 오류: {e}")
+
+def _prepare_clip(index: int, info: dict, base_resolution: tuple, work_dir: str):
+    """
+    비디오 하나를 오디오 길이에 맞게 자르거나 속도를 조정하고, 해상도를 맞추고 자막을 입혀
+    중간 결과 파일로 저장합니다.
+
+    모든 처리는 FFmpeg 필터 그래프 한 번으로 실행되며, 모든 중간 파일은 같은
+    코덱/해상도/fps/오디오 형식으로 인코딩되어 재인코딩 없이 이어 붙일 수 있습니다.
+
+    Args:
+        index (int): 클립 순서 (로그 및 파일명에 사용)
+        info (dict): 비디오 정보 ('path', 'audio_path', 'text', 'audio_duration')
+        base_resolution (tuple): 출력 해상도 (width, height)
+        work_dir (str): 중간 결과 파일을 저장할 디렉토리
+
+    Returns:
+        str: 중간 결과 파일 경로. 처리할 수 없는 항목이면 None
+    """
+    # 필수 정보 확인
+    if 'path' not in info:
+        print(f"경고: 항목 {index}에 path가 없습니다. 건너뜁니다.")
+        return None
+    
+    video_path = info['path']
+    text = info.get('text', '')
+    
+    # 오디오 정보 확인 (파일 또는 길이)
+    audio_path = info.get('audio_path', None)
+    audio_duration = info.get('audio_duration', None)
+    
+    # 비디오 정보 확인
+    try:
+        video_info = probe_media(video_path)
+        video_duration = video_info['duration']
+        print(f"  ✅ [{index+1}] 비디오 로드 완료: {os.path.basename(video_path)}")
     except Exception as e:
-        print(f"클립 해제 중 오류: {e}")
+        print(f"  ❌ [{index+1}] 비디오 로드 중 오류: {video_path} - {e}")
+        return None
+    
+    # 오디오 로드 또는 기본 오디오 사용
+    use_external_audio = False
+    if audio_path and os.path.exists(audio_path):
+        try:
+            audio_duration = probe_media(audio_path)['duration']
+            use_external_audio = True
+            print(f"  🔊 [{index+1}] 외부 오디오 로드 완료: {os.path.basename(audio_path)}")
+        except Exception as e:
+            print(f"  ⚠️ [{index+1}] 오디오 로드 중 오류: {audio_path} - {e}")
+            # 오디오 로드 실패 시 비디오 원본 오디오 사용
+            audio_duration = video_duration
+    elif audio_duration is None:
+        # 오디오 정보가 전혀 없는 경우 비디오 원본 오디오와 길이 사용
+        audio_duration = video_duration
+    
+    width, height = base_resolution
+    duration = audio_duration or video_duration
+    
+    inputs = ["-i", video_path]
+    video_filters = []
+    
+    # 비디오 길이 조정
+    if audio_duration and video_duration > audio_duration:
+        # 비디오 중간 부분을 오디오 길이에 맞게 자르기
+        # 입력 쪽 탐색(-ss/-t)을 사용하면 앞부분 전체를 디코딩하지 않고 가까운 키프레임부터 읽음
+        # (재인코딩하므로 잘리는 위치는 프레임 단위로 정확함)
+        start_time = (video_duration - audio_duration) / 2
+        inputs = ["-ss", f"{start_time:.3f}", "-t", f"{audio_duration:.3f}", "-i", video_path]
+        print(f"  ✂️ [{index+1}] 비디오 길이 조정: {video_duration:.1f}s → {audio_duration:.1f}s")
+    elif audio_duration and video_duration < audio_duration:
+        # 비디오가 오디오보다 짧은 경우, 비디오 속도 조절
+        factor = video_duration / audio_duration
+        video_filters.append(f"setpts=PTS/{factor:.6f}")
+        print(f"  ⚡ [{index+1}] 비디오 속도 조정: {factor:.2f}x")
+    
+    # 해상도와 fps 맞추기
+    video_filters += [f"scale={width}:{height}", "setsar=1", "fps=24"]
+    filter_parts = [f"[0:v]{','.join(video_filters)}[base]"]
+    video_label = "[base]"
+    next_input = 1
+    
+    # 자막 추가 (PNG로 렌더링해 화면 중앙에 오버레이)
+    if text:
+        try:
+            caption_path = _cached_caption(text, width - CAPTION_MARGIN * 2)
+            inputs += ["-i", caption_path]
+            filter_parts.append(f"{video_label}[{next_input}:v]overlay=(W-w)/2:(H-h)/2[captioned]")
+            video_label = "[captioned]"
+            next_input += 1
+            print(f"  📝 [{index+1}] 자막 추가 완료")
+        except Exception as e:
+            print(f"  ⚠️ [{index+1}] 자막 추가 중 오류: {e}")
+    filter_parts.append(f"{video_label}format=yuv420p[v]")
+    
+    # 오디오 선택 (없으면 무음 트랙을 넣어 모든 중간 파일의 스트림 구성을 맞춤)
+    if use_external_audio:
+        inputs += ["-i", audio_path]
+        filter_parts.append(f"[{next_input}:a]{_AUDIO_FORMAT}[a]")
+    elif video_info['has_audio']:
+        # 원본 오디오는 비디오 입력과 함께 잘려 있음
+        filter_parts.append(f"[0:a]{_AUDIO_FORMAT}[a]")
+    else:
+        inputs += ["-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo"]
+        filter_parts.append(f"[{next_input}:a]{_AUDIO_FORMAT}[a]")
+    
+    # 중간 결과 저장 (최종 단계에서는 재인코딩하지 않으므로 최종 화질로 인코딩)
+    # 모든 클립이 같은 인코더를 써야 concat 시 스트림 복사가 가능하므로 캐시된 인코더 사용
+    encoder, encoder_options = get_video_encoder()
+    clip_path = os.path.join(work_dir, f"clip_{index}.mp4")
+    _run_ffmpeg([
+        *inputs,
+        "-filter_complex", ";".join(filter_parts),
+        "-map", "[v]", "-map", "[a]",
+        "-t", f"{duration:.3f}",
+        "-c:v", encoder, *encoder_options,
+        "-c:a", "aac", "-b:a", "192k",
+        clip_path,
+    ])
+    
+    print(f"  ✅ 클립 {index+1} 처리 완료")
+    return clip_path
+
+def _concat_clips(clip_paths: list[str], output_path: str, work_dir: str) -> str:
+    """
+    같은 형식으로 인코딩된 중간 파일들을 FFmpeg concat demuxer로 재인코딩 없이 이어 붙입니다.
+
+    Args:
+        clip_paths (list[str]): 이어 붙일 중간 파일 경로 리스트 (순서대로)
+        output_path (str): 결과 비디오를 저장할 경로
+        work_dir (str): 목록 파일을 저장할 디렉토리
+
+    Returns:
+        str: 생성된 비디오 파일 경로
+    """
+    list_path = os.path.join(work_dir, "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for clip_path in clip_paths:
+            # concat 목록 파일에서는 작은따옴표를 이스케이프해야 함
+            escaped = os.path.abspath(clip_path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    
+    _run_ffmpeg([
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-c", "copy", "-movflags", "+faststart",
+        output_path,
+    ])
+    return output_path
 
 def create_composite_video(video_infos: list[dict], output_path: str) -> str:
     """
     비디오 클립들과 오디오를 합성하여 하나의 영상을 만듭니다.
     
-    FFmpeg 프로세스 누수를 방지하기 위해 모든 자원을 안전하게 관리합니다.
+    클립별 전처리(길이 조정, 리사이즈, 자막)는 클립마다 FFmpeg 필터 그래프로 실행하여
+    스레드 풀에서 병렬로 중간 파일을 만들고, 최종 영상은 중간 파일들을 재인코딩 없이 이어 붙여 생성합니다.
     
     Parameters
     ----------
@@ -93,152 +482,36 @@ def create_composite_video(video_infos: list[dict], output_path: str) -> str:
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
     
-    # 임시 디렉토리 생성 (없는 경우)
+    # 작업별 임시 디렉토리 생성 (중간 파일 저장용)
     temp_dir = "temp_video_processing"
-    os.makedirs(temp_dir, exist_ok=True)
+    work_dir = os.path.join(temp_dir, uuid.uuid4().hex)
+    os.makedirs(work_dir, exist_ok=True)
     
-    # 자원 추적을 위한 리스트들
-    all_clips = []  # 모든 생성된 클립들을 추적
-    final_clips = []
     base_resolution = (1920, 1080)  # 기준 해상도 (width, height)
     
     try:
         print(f"🎬 비디오 합성 시작: {len(video_infos)}개 클립 처리")
         
-        for i, info in enumerate(video_infos):
-            print(f"📹 클립 {i+1}/{len(video_infos)} 처리 중...")
-            
-            # 필수 정보 확인
-            if 'path' not in info:
-                print(f"경고: 항목 {i}에 path가 없습니다. 건너뜁니다.")
-                continue
-            
-            video_path = info['path']
-            text = info.get('text', '')
-            
-            # 오디오 정보 확인 (파일 또는 길이)
-            audio_path = info.get('audio_path', None)
-            audio_duration = info.get('audio_duration', None)
-            
-            # 비디오 로드
-            video_clip = None
-            audio_clip = None
-            
-            try:
-                video_clip = VideoFileClip(video_path)
-                all_clips.append(video_clip)
-                print(f"  ✅ 비디오 로드 완료: {os.path.basename(video_path)}")
-            except Exception as e:
-                print(f"  ❌ 비디오 로드 중 오류: {video_path} - {e}")
-                continue
-            
-            # 기준 해상도 설정 (첫 번째 유효한 비디오)
-            if base_resolution is None:
-                base_resolution = video_clip.size  # (width, height)
-            
-            # 오디오 로드 또는 기본 오디오 사용
-            if audio_path and os.path.exists(audio_path):
-                try:
-                    audio_clip = AudioFileClip(audio_path)
-                    all_clips.append(audio_clip)
-                    audio_duration = audio_clip.duration
-                    print(f"  🔊 외부 오디오 로드 완료: {os.path.basename(audio_path)}")
-                except Exception as e:
-                    print(f"  ⚠️ 오디오 로드 중 오류: {audio_path} - {e}")
-                    # 오디오 로드 실패 시 비디오 원본 오디오 사용
-                    audio_clip = video_clip.audio
-                    audio_duration = audio_clip.duration if audio_clip else video_clip.duration
-            elif audio_duration is not None:
-                # 오디오 파일 없이 길이만 제공된 경우 비디오 원본 오디오 사용
-                audio_clip = video_clip.audio
-                # 원본 오디오가 없는 경우 (무음 비디오)
-                if audio_clip is None:
-                    audio_clip = None
-            else:
-                # 오디오 정보가 전혀 없는 경우 비디오 원본 오디오와 길이 사용
-                audio_clip = video_clip.audio
-                audio_duration = video_clip.duration if video_clip.audio else video_clip.duration
-            
-            # 비디오 길이 조정 (중간 부분을 오디오 길이에 맞게 자르기)
-            adjusted_clip = None
-            if audio_duration and video_clip.duration > audio_duration:
-                # 비디오 중간 부분을 오디오 길이에 맞게 자르기
-                start_time = (video_clip.duration - audio_duration) / 2
-                adjusted_clip = video_clip.subclipped(start_time, start_time + audio_duration)
-                all_clips.append(adjusted_clip)
-                print(f"  ✂️ 비디오 길이 조정: {video_clip.duration:.1f}s → {audio_duration:.1f}s")
-            elif audio_duration and video_clip.duration < audio_duration:
-                # 비디오가 오디오보다 짧은 경우, 비디오 속도 조절
-                factor = video_clip.duration / audio_duration
-                adjusted_clip = video_clip.with_speed_scaled(factor)
-                all_clips.append(adjusted_clip)
-                print(f"  ⚡ 비디오 속도 조정: {factor:.2f}x")
-            else:
-                # 길이가 같거나 오디오 길이 정보가 없는 경우
-                adjusted_clip = video_clip
-            
-            # 오디오 할당 (오디오가 있는 경우)
-            if audio_clip is not None:
-                adjusted_clip = adjusted_clip.with_audio(audio_clip)
-            
-            # 해상도 맞추기 (기준 해상도에 맞게 리사이즈)
-            if base_resolution is not None and adjusted_clip.size != base_resolution:
-                resized_clip = adjusted_clip.with_effects([fx.Resize(base_resolution)])
-                all_clips.append(resized_clip)
-                adjusted_clip = resized_clip
-                print(f"  📐 해상도 조정: {adjusted_clip.size} → {base_resolution}")
-            
-            # 자막 추가
-            if text:
-                try:
-                    txt_clip = (
-                        TextClip(
-                            font="fonts/NotoSansKR-Medium.ttf",
-                            font_size=48,  # 36에서 48로 크기 증가
-                            text=text,
-                            color="white",
-                            stroke_color="black",  # 검정 테두리 추가
-                            stroke_width=3,  # 테두리 두께 설정
-                            method='caption',
-                            size=base_resolution  # 기준 해상도에 맞게 자막 크기 설정
-                        )
-                        .with_position(("center", "bottom"))
-                        .with_duration(adjusted_clip.duration)
-                    )
-                    all_clips.append(txt_clip)
-                    
-                    composite_clip = CompositeVideoClip([adjusted_clip, txt_clip])
-                    all_clips.append(composite_clip)
-                    adjusted_clip = composite_clip
-                    print(f"  📝 자막 추가 완료")
-                except Exception as e:
-                    print(f"  ⚠️ 자막 추가 중 오류: {e}")
-            
-            # 최종 클립 목록에 추가
-            final_clips.append(adjusted_clip)
-            print(f"  ✅ 클립 {i+1} 처리 완료")
+        # 클립별 전처리를 병렬 실행 (인코딩은 FFmpeg 하위 프로세스에서 진행되므로 스레드로 충분)
+        max_workers = max(1, min(len(video_infos), (os.cpu_count() or 2) // 2))
+        if get_video_encoder()[0] != _SW_ENCODER[0]:
+            max_workers = min(max_workers, HW_ENCODER_MAX_SESSIONS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            clip_paths = list(executor.map(
+                lambda item: _prepare_clip(item[0], item[1], base_resolution, work_dir),
+                enumerate(video_infos),
+            ))
+        
+        # 처리에 실패한 항목 제외 (순서 유지)
+        clip_paths = [path for path in clip_paths if path]
         
         # 클립이 없는 경우 처리
-        if not final_clips:
+        if not clip_paths:
             raise ValueError("처리할 수 있는 유효한 비디오 클립이 없습니다.")
         
-        print(f"🔗 {len(final_clips)}개 클립 연결 중...")
+        print(f"🔗 {len(clip_paths)}개 클립 연결 중: {output_path}")
         
-        # 모든 클립 연결
-        final_video = concatenate_videoclips(final_clips, method="compose")
-        all_clips.append(final_video)
-        
-        print(f"💾 최종 비디오 저장 중: {output_path}")
-        
-        # 최종 비디오 저장 (더 안전한 설정)
-        final_video.write_videofile(
-            output_path,
-            codec="libx264",
-            audio_codec="aac",
-            temp_audiofile=f"{temp_dir}/temp-audio-{int(time.time())}.m4a",
-            remove_temp=True,
-            fps=24,
-        )
+        _concat_clips(clip_paths, output_path, work_dir)
         
         print(f"✅ 비디오 생성 완료: {output_path}")
         return output_path
@@ -250,21 +523,13 @@ def create_composite_video(video_infos: list[dict], output_path: str) -> str:
     finally:
         print("🧹 자원 정리 중...")
         
-        # 모든 클립 자원 해제 (역순으로)
-        for clip in reversed(all_clips):
-            safe_close_clip(clip)
-        
-        # 메모리 정리
-        final_clips.clear()
-        all_clips.clear()
+        # 중간 파일 삭제
+        shutil.rmtree(work_dir, ignore_errors=True)
         
         # 가비지 컬렉션 강제 실행
         gc.collect()
         
-        # FFmpeg 프로세스 정리 (약간의 지연 후)
-        time.sleep(1)
-        kill_ffmpeg_processes()
-        
+        # FFmpeg 프로세스는 _run_ffmpeg에서 종료를 기다리고, 예외 시에도 종료시키므로 별도 대기 없음
         print("✅ 자원 정리 완료")
 
 def cleanup_video_resources():
@@ -280,7 +545,6 @@ def cleanup_video_resources():
         temp_dir = "temp_video_processing"
         if os.path.exists(temp_dir):
             try:
-                import shutil
                 for file in os.listdir(temp_dir):
                     file_path = os.path.join(temp_dir, file)
                     if os.path.isfile(file_path):
@@ -1,24 +1,74 @@
 from google import genai
+from google.genai import types
 import os
 from dotenv import load_dotenv
 from typing import Optional
 import chromadb
+from chromadb.config import Settings
+import numpy as np
 import uuid
+from functools import lru_cache
+from src.lib.embedding_cache import embedding_cache
+from src.db import get_cached_embeddings, save_cached_embeddings
 
-chroma_client = chromadb.PersistentClient()
+@lru_cache(maxsize=1)
+def get_chroma_client():
+    """
+    Chroma 영구 클라이언트를 처음 사용할 때 생성합니다.
+
+    모듈 임포트 시점에 DB를 열지 않아 서버/워커 시작이 인덱스 크기에 영향받지 않습니다.
+    """
+    client = chromadb.PersistentClient(
+        settings=Settings(anonymized_telemetry=False)  # add/query마다 텔레메트리 이벤트를 보내지 않음
+    )
+
+    if not client.heartbeat():
+        raise Exception("Chroma DB 연결 실패")
+
+    return client
+
+
+@lru_cache(maxsize=1)
+def get_video_collection():
+    """비디오 임베딩 컬렉션을 반환합니다. (최초 호출 시 생성 또는 로드)"""
+    # Gemini 임베딩 모델에 최적화된 코사인 거리 함수 사용
+    # hnsw:batch_size - 이 개수만큼 모인 뒤 HNSW 그래프에 한 번에 추가
+    # hnsw:sync_threshold - 이 개수만큼 추가된 뒤 HNSW 인덱스를 디스크에 기록 (그 사이 데이터는 Chroma WAL에 보존)
+    # HNSW 설정은 컬렉션을 새로 만들 때만 적용됨
+    return get_chroma_client().get_or_create_collection(
+        name="video", 
+        metadata={
+            "hnsw:space": "cosine",
+            "hnsw:batch_size": 1000,
+            "hnsw:sync_threshold": 10000,
+        }
+    )
+
+
+def warm_up_collection():
+    """
+    컬렉션과 HNSW 인덱스를 미리 메모리에 올립니다. 애플리케이션 시작 시 호출합니다.
 
-if not chroma_client.heartbeat():
-    raise Exception("Chroma DB 연결 실패")
+    저장된 벡터 하나로 검색을 한 번 실행해 첫 사용자 요청이 인덱스 로딩 시간을 기다리지 않게 합니다.
+    """
+    collection = get_video_collection()
+    sample = collection.get(limit=1, include=["embeddings"])
+    embeddings = sample.get("embeddings")
+    if embeddings is not None and len(embeddings) > 0:
+        collection.query(query_embeddings=[embeddings[0]], n_results=1)
 
-# Gemini 임베딩 모델에 최적화된 코사인 거리 함수 사용
-video_collection = chroma_client.get_or_create_collection(
-    name="video", 
-    metadata={"hnsw:space": "cosine"}
-)
 
 # 환경 변수 로드
 load_dotenv()
 
+# embed_content 요청 한 번에 보낼 최대 텍스트 수
+EMBEDDING_BATCH_SIZE = 96
+
+# 임베딩 차원 수 (미설정 시 모델 기본값 3072)
+# 768 등으로 줄이면 저장 공간과 검색 시 거리 계산량이 비례해서 줄어듦
+# 기존 컬렉션과 차원이 달라지므로 새 컬렉션(빈 DB)에서만 변경해야 함
+EMBEDDING_DIMENSIONALITY = int(os.getenv("EMBEDDING_DIMENSIONALITY", "0")) or None
+
 # Gemini 클라이언트 초기화
 def get_gemini_client(api_key: Optional[str] = None):
     """Gemini 클라이언트를 초기화합니다."""
@@ -31,6 +81,7 @@ def get_embeddings(
     texts: list[str],
     model: str = "gemini-embedding-exp-03-07",
     api_key: Optional[str] = None,
+    persist: bool = False,
 ):
     """
     텍스트 리스트의 임베딩을 생성합니다.
@@ -39,60 +90,178 @@ def get_embeddings(
         texts (list): 임베딩을 생성할 텍스트 리스트
         model (str): 사용할 임베딩 모델명 (기본값: "gemini-embedding-exp-03-07")
         api_key (str, optional): API 키. 지정하지 않으면 환경 변수에서 가져옵니다.
+        persist (bool): True이면 디스크(SQLite) 캐시도 조회/저장합니다.
+            검색어처럼 다시 요청될 텍스트에만 사용 (문서 임베딩은 이미 Chroma에 저장됨)
 
     Returns:
         list: 각 텍스트의 임베딩 벡터 리스트
     """
-    client = get_gemini_client(api_key)
-    
-    embeddings = []
-    for text in texts:
-        result = client.models.embed_content(
-            model=model,
-            contents=text,
+    # 차원 수가 다르면 다른 임베딩이므로 캐시 키에 포함
+    cache_model = f"{model}@{EMBEDDING_DIMENSIONALITY}" if EMBEDDING_DIMENSIONALITY else model
+    embeddings = [embedding_cache.get(cache_model, text) for text in texts]
+
+    # 캐시에 없는 텍스트만 API로 임베딩 (같은 텍스트가 여러 번 있으면 한 번만 요청)
+    misses = list(dict.fromkeys(text for text, emb in zip(texts, embeddings) if emb is None))
+    if not misses:
+        return embeddings
+
+    # 디스크(SQLite)에 저장된 임베딩 확인 (서버 재시작이나 메모리 캐시 만료 후에도 재사용)
+    keys = {text: embedding_cache.make_key(cache_model, text) for text in misses}
+    stored = get_cached_embeddings(list(keys.values())) if persist else {}
+    fetched = {}
+    for text in misses:
+        vector = stored.get(keys[text])
+        if vector is not None:
+            embedding = np.frombuffer(vector, dtype=np.float32).tolist()
+            fetched[text] = embedding
+            embedding_cache.set(cache_model, text, embedding)
+
+    misses = [text for text in misses if text not in fetched]
+    if misses:
+        client = get_gemini_client(api_key)
+        config = (
+            types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIMENSIONALITY)
+            if EMBEDDING_DIMENSIONALITY else None
         )
-        # result.embeddings는 ContentEmbedding 객체들의 리스트
-        # 각 ContentEmbedding 객체에서 values 속성을 추출
-        if hasattr(result.embeddings[0], 'values'):
-            embeddings.append(result.embeddings[0].values)
-        else:
-            # 이미 float 리스트인 경우
-            embeddings.append(result.embeddings[0])
 
-    return embeddings
+        new_vectors = []
+        # 요청 한 번에 여러 텍스트를 보내고, API 배치 한도를 넘지 않도록 나눠서 호출
+        for start in range(0, len(misses), EMBEDDING_BATCH_SIZE):
+            batch = misses[start:start + EMBEDDING_BATCH_SIZE]
+            result = client.models.embed_content(
+                model=model,
+                contents=batch,
+                config=config,
+            )
+            # result.embeddings는 ContentEmbedding 객체들의 리스트 (입력 순서와 동일)
+            # 각 ContentEmbedding 객체에서 values 속성을 추출
+            for text, embedding in zip(batch, result.embeddings):
+                if hasattr(embedding, 'values'):
+                    embedding = embedding.values
+                # 이미 float 리스트인 경우 그대로 사용
+                # 단위 벡터로 정규화해 저장/검색/MMR에서 내적이 곧 코사인 유사도가 되도록 함
+                # (차원을 줄인 임베딩은 API가 정규화해서 주지 않으므로 반드시 필요)
+                vector = np.asarray(embedding, dtype=np.float32)
+                vector = vector / (np.linalg.norm(vector) + 1e-12)
+                embedding = vector.tolist()
+                fetched[text] = embedding
+                embedding_cache.set(cache_model, text, embedding)
+                new_vectors.append((keys[text], vector.astype(np.float32).tobytes()))
+
+        if persist:
+            save_cached_embeddings(new_vectors)
+
+    # 입력 순서를 유지하며 캐시 결과와 새로 받은 결과를 합침
+    return [emb if emb is not None else fetched[text] for text, emb in zip(texts, embeddings)]
 
 
 def add_to_chroma(text: str, metadata: dict):
     """
     텍스트와 메타데이터를 Chroma DB에 추가합니다.
 
+    Args:
+        text (str): 저장할 텍스트
+        metadata (dict): 텍스트에 해당하는 메타데이터
+
+    Returns:
+        list: 생성된 ID 리스트
+    """
+    return add_to_chroma_batch([text], [metadata])
+
+
+def add_to_chroma_batch(texts: list[str], metadatas: list[dict], ids: Optional[list[str]] = None):
+    """
+    여러 텍스트와 메타데이터를 한 번에 Chroma DB에 추가합니다.
+
+    임베딩은 배치 단위로 생성하고, 컬렉션에는 한 번의 add 호출로 저장합니다.
+
     Args:
         texts (list[str]): 저장할 텍스트 리스트
-        metadata (list[dict]): 각 텍스트에 해당하는 메타데이터 리스트
-        collection: ChromaDB 컬렉션 객체 (없으면 기본 컬렉션 사용)
+        metadatas (list[dict]): 각 텍스트에 해당하는 메타데이터 리스트
+        ids (list[str], optional): 사용할 ID 리스트. 지정하지 않으면 UUID로 생성합니다.
 
     Returns:
         list: 생성된 ID 리스트
     """
+    if not texts:
+        return []
+
     # UUID를 사용하여 고유 ID 생성
-    ids = [str(uuid.uuid4())]
+    if ids is None:
+        ids = [str(uuid.uuid4()) for _ in texts]
 
-    embeddings = get_embeddings([text])
+    # float32 배열로 한 번에 변환해 ChromaDB가 행마다 변환하지 않도록 함
+    embeddings = np.asarray(get_embeddings(texts), dtype=np.float32)
 
-    video_collection.add(
-        ids=ids, embeddings=embeddings, documents=[text], metadatas=[metadata]
+    get_video_collection().add(
+        ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas
     )
 
     return ids  # 생성된 ID 반환 (필요시 활용 가능)
 
 
-def search_chroma(text: str, n_results: int = 10):
+class VideoIndexer:
+    """
+    Chroma DB에 추가할 텍스트를 모아 두었다가 한 번에 임베딩하고 저장하는 컨텍스트 매니저입니다.
+
+    사용 예시:
+        with VideoIndexer() as indexer:
+            for text, metadata in pairs:
+                indexer.add(text, metadata)
+
+    Args:
+        max_buffer (int): 이 개수만큼 모이면 블록이 끝나기 전이라도 중간 저장
+    """
+
+    def __init__(self, max_buffer: int = 500):
+        self.max_buffer = max_buffer
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+
+    def add(self, text: str, metadata: dict) -> str:
+        """텍스트를 버퍼에 추가하고, 저장될 ID를 반환합니다."""
+        doc_id = str(uuid.uuid4())
+        self._ids.append(doc_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+
+        if len(self._texts) >= self.max_buffer:
+            self.flush()
+        return doc_id
+
+    def flush(self):
+        """버퍼에 모인 텍스트를 임베딩하여 Chroma DB에 저장합니다."""
+        if not self._texts:
+            return
+
+        add_to_chroma_batch(self._texts, self._metadatas, ids=self._ids)
+        self._ids, self._texts, self._metadatas = [], [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 블록 안에서 예외가 발생하면 버퍼를 저장하지 않음
+        if exc_type is None:
+            self.flush()
+        return False
+
+
+def search_chroma(
+    text: str,
+    n_results: int = 10,
+    where: Optional[dict] = None,
+    query_embedding: Optional[list[float]] = None,
+):
     """
     Chroma DB에서 텍스트를 검색합니다.
 
     Args:
         query (str): 검색할 쿼리 텍스트
         n_results (int): 검색 결과 수 (기본값: 10)
+        where (dict, optional): 메타데이터 필터 (예: {"file_name": {"$nin": [...]}})
+        query_embedding (list[float], optional): 미리 계산한 쿼리 임베딩. 있으면 다시 임베딩하지 않음
 
     Returns:
         list: 검색 결과 리스트
@@ -104,13 +273,129 @@ def search_chroma(text: str, n_results: int = 10):
         - 0.5 ~ 1.0: 보통
         - 1.0 ~ 2.0: 다름
     """
-    results = video_collection.query(
-        query_embeddings=get_embeddings([text]), n_results=n_results
+    if query_embedding is None:
+        query_embedding = get_embeddings([text], persist=True)[0]
+
+    results = get_video_collection().query(
+        query_embeddings=[query_embedding], n_results=n_results, where=where
     )
 
     return results
 
 
+def search_chroma_batch(texts: list[str], n_results: int = 10, where: Optional[dict] = None):
+    """
+    여러 쿼리 텍스트를 한 번에 검색합니다.
+
+    임베딩은 요청 한 번으로 만들고(캐시에 있는 텍스트는 제외), 벡터 검색도 한 번의 query로 실행합니다.
+    같은 텍스트가 여러 번 있으면 한 번만 검색하고 결과를 함께 사용합니다.
+
+    Args:
+        texts (list[str]): 검색할 쿼리 텍스트 리스트
+        n_results (int): 쿼리별 검색 결과 수 (기본값: 10)
+        where (dict, optional): 모든 쿼리에 적용할 메타데이터 필터
+
+    Returns:
+        list[dict]: 입력 순서대로 search_chroma와 같은 형식의 결과 리스트
+    """
+    if not texts:
+        return []
+
+    unique_texts = list(dict.fromkeys(texts))
+    results = get_video_collection().query(
+        query_embeddings=get_embeddings(unique_texts, persist=True), n_results=n_results, where=where
+    )
+
+    # 쿼리별 결과로 나눔 (search_chroma 결과처럼 바깥 리스트에 하나씩 담음)
+    keys = [key for key in ("ids", "documents", "metadatas", "distances") if results.get(key) is not None]
+    by_text = {
+        text: {key: [results[key][i]] for key in keys}
+        for i, text in enumerate(unique_texts)
+    }
+    return [by_text[text] for text in texts]
+
+
+def get_metadata_by_file_names(file_names: list[str]) -> dict[str, dict]:
+    """
+    파일명으로 Chroma에 저장된 영상 메타데이터를 한 번에 가져옵니다. (임베딩/벡터 검색 없음)
+
+    Args:
+        file_names (list[str]): 찾을 파일명 리스트
+
+    Returns:
+        dict: {파일명: 메타데이터}, Chroma에 없는 파일은 포함되지 않음
+    """
+    if not file_names:
+        return {}
+
+    results = get_video_collection().get(
+        where={"file_name": {"$in": list(dict.fromkeys(file_names))}}, include=["metadatas"]
+    )
+    return {
+        metadata["file_name"]: metadata
+        for metadata in results["metadatas"] or []
+        if metadata and metadata.get("file_name")
+    }
+
+
+def search_chroma_mmr(text: str, n_results: int = 10, fetch_k: Optional[int] = None, lambda_mult: float = 0.5):
+    """
+    MMR(Maximal Marginal Relevance)로 관련성과 다양성을 함께 고려해 검색합니다.
+
+    후보를 fetch_k개 가져온 뒤 서로 비슷한 결과가 반복되지 않도록 n_results개를 고릅니다.
+    유사도 행렬은 한 번의 행렬 곱으로 계산합니다.
+
+    Args:
+        text (str): 검색할 쿼리 텍스트
+        n_results (int): 검색 결과 수 (기본값: 10)
+        fetch_k (int, optional): 후보 수 (기본값: n_results의 3배)
+        lambda_mult (float): 1에 가까울수록 관련성, 0에 가까울수록 다양성을 우선 (기본값: 0.5)
+
+    Returns:
+        dict: search_chroma와 같은 형식의 결과 (MMR 선택 순서로 정렬)
+    """
+    fetch_k = max(fetch_k or n_results * 3, n_results)
+    query_embedding = np.asarray(get_embeddings([text], persist=True)[0], dtype=np.float32)
+
+    results = get_video_collection().query(
+        query_embeddings=[query_embedding],
+        n_results=fetch_k,
+        include=["embeddings", "documents", "metadatas", "distances"],
+    )
+
+    ids = results["ids"][0]
+    if not ids:
+        return results
+
+    # 저장된 벡터와 쿼리 벡터는 get_embeddings에서 이미 단위 벡터로 정규화됨 (내적 = 코사인 유사도)
+    # 정규화 이전에 저장된 벡터가 섞여 있을 수 있으므로 후보 벡터만 다시 정규화
+    candidates = np.asarray(results["embeddings"][0], dtype=np.float32)
+    candidates /= np.linalg.norm(candidates, axis=1, keepdims=True) + 1e-12
+
+    sim_query = candidates @ query_embedding  # (k,)
+    sim_candidates = candidates @ candidates.T  # (k, k)
+
+    selected = np.zeros(len(ids), dtype=bool)
+    order = []
+    for _ in range(min(n_results, len(ids))):
+        if order:
+            redundancy = sim_candidates[:, selected].max(axis=1)
+        else:
+            redundancy = np.zeros(len(ids), dtype=np.float32)
+        scores = lambda_mult * sim_query - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        next_idx = int(scores.argmax())
+        selected[next_idx] = True
+        order.append(next_idx)
+
+    return {
+        "ids": [[ids[i] for i in order]],
+        "documents": [[results["documents"][0][i] for i in order]],
+        "metadatas": [[results["metadatas"][0][i] for i in order]],
+        "distances": [[results["distances"][0][i] for i in order]],
+    }
+
+
 # 사용 예시:
 if __name__ == "__main__":
     texts = ["good morning from litellm", "this is another item"]
@@ -0,0 +1,83 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class EmbeddingCache:
+    """
+    텍스트 임베딩을 메모리에 저장하는 LRU + TTL 캐시입니다.
+
+    같은 검색어나 텍스트를 다시 임베딩할 때 API 호출 없이 저장된 벡터를 반환합니다.
+    키는 (모델명, 텍스트)의 SHA-256 해시이며, 여러 스레드에서 동시에 사용할 수 있습니다.
+
+    Args:
+        maxsize (int): 최대 저장 개수. 넘으면 가장 오래 사용하지 않은 항목부터 제거
+        ttl (float): 항목 유효 시간(초)
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (만료 시각, 임베딩)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}|{text}".encode("utf-8")).digest()
+
+    def get(self, model: str, text: str):
+        """캐시된 임베딩을 반환합니다. 없거나 만료되었으면 None을 반환합니다."""
+        key = self.make_key(model, text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self._misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, model: str, text: str, embedding):
+        """임베딩을 캐시에 저장합니다."""
+        key = self.make_key(model, text)
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, embedding)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """캐시와 통계를 초기화합니다."""
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> dict:
+        """
+        캐시 사용 통계를 반환합니다.
+
+        Returns:
+            dict: size, hits, misses, hit_rate
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+# 전역 임베딩 캐시 인스턴스
+embedding_cache = EmbeddingCache()
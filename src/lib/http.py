@@ -0,0 +1,20 @@
+import httpx
+
+# 외부 HTTP 요청(Typecast, 비디오 다운로드)에 공유하는 비동기 클라이언트
+# HTTP/2와 커넥션 풀을 재사용하고, 연결 실패는 전송 계층에서 재시도
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=3.0)
+HTTP_CONNECT_RETRIES = 3
+
+async_client = httpx.AsyncClient(
+    timeout=HTTP_TIMEOUT,
+    follow_redirects=True,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True, limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES
+    ),
+)
+
+
+async def close_http_client():
+    """애플리케이션 종료 시 공유 클라이언트의 연결을 닫습니다."""
+    await async_client.aclose()
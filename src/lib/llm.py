@@ -1,11 +1,24 @@
-from openai import OpenAI
+from openai import OpenAI, DefaultHttpxClient
 from dotenv import load_dotenv
 import os
+import httpx
 from google import genai
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI 요청용 HTTP 설정 (HTTP/2 + 커넥션 풀 재사용으로 요청마다 연결을 새로 맺지 않음)
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+OPENAI_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+# 429/5xx 등 일시적인 오류 재시도 횟수 (SDK가 Retry-After와 지터가 섞인 지수 백오프로 재시도)
+OPENAI_MAX_RETRIES = 5
+
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=OPENAI_MAX_RETRIES,
+    http_client=DefaultHttpxClient(
+        http2=True, limits=OPENAI_HTTP_LIMITS, timeout=OPENAI_HTTP_TIMEOUT
+    ),
+)
 
 # Gemini 클라이언트 생성
-gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
\ No newline at end of file
+gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
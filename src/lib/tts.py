@@ -1,10 +1,17 @@
 import os
 import uuid
+import asyncio
+import aiofiles
 import requests
+import requests.adapters
+from urllib3.util import Retry
 import json
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from src.lib.llm import client  # OpenAI client import
+from src.lib.http import async_client as http_client
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +24,45 @@ os.makedirs(AUDIO_DIR, exist_ok=True)
 TYPECAST_API_URL = "https://typecast.ai/api/speak"
 TYPECAST_API_KEY = os.getenv("TYPECAST_API_KEY")
 
+# Typecast API 요청 헤더 (오디오 다운로드 URL에는 인증 헤더를 보내지 않으므로 세션에 넣지 않음)
+_TYPECAST_HEADERS = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {TYPECAST_API_KEY}",
+}
+
+# 일시적인 오류(429/5xx, 연결 끊김)는 지터가 섞인 지수 백오프로 재시도
+# Retry-After 헤더가 있으면 그 시간만큼 기다리고, 재시도를 다 써도 실패하면 응답을 그대로 돌려줘서 아래에서 예외 처리
+# 음성 생성 요청(POST)은 응답을 못 받았어도 서버에 작업이 생겼을 수 있으므로 여기서 재시도하지 않음
+# (연결 자체가 안 된 경우만 재시도되고, 429는 _post_speak에서 따로 처리)
+_retry = Retry(
+    total=5,
+    backoff_factor=0.5,
+    backoff_jitter=0.25,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET"],
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+# Typecast 요청에 재사용하는 세션 (매 요청마다 TCP/TLS 연결을 새로 맺지 않도록 커넥션 풀 사용)
+_session = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=_retry)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+# Typecast 요청 타임아웃 (연결, 읽기) 초
+TYPECAST_TIMEOUT = (3, 30)
+# 음성 생성 완료를 기다리는 최대 시간(초)
+TYPECAST_POLL_TIMEOUT = 120
+# 오디오 다운로드 시 한 번에 기록하는 크기
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# 음성 생성 요청이 429(요청 한도 초과)로 거절됐을 때 다시 보낼 최대 횟수
+TYPECAST_SPEAK_429_RETRIES = 3
+
+# 동시에 진행할 Typecast 음성 생성 작업 수 (세션 커넥션 풀 크기 이하로 유지)
+TYPECAST_CONCURRENCY = 8
+
 # 액터 이름과 ID 매핑
 TYPECAST_ACTORS = {
     "현주": "6335062fd260d463f7d7abb9",
@@ -27,6 +73,9 @@ TYPECAST_ACTORS = {
     "호빈이": "5ffda49bcba8f6d3d46fc447",
 }
 
+# 에러 메시지용 액터 목록
+_AVAILABLE_ACTORS = ", ".join(TYPECAST_ACTORS)
+
 
 def generate_tts_audio(text: str, voice: str = "onyx") -> str:
     """
@@ -45,18 +94,104 @@ def generate_tts_audio(text: str, voice: str = "onyx") -> str:
     filename = f"{unique_id}.mp3"
     filepath = os.path.join(AUDIO_DIR, filename)
 
-    # TTS 생성
-    response = client.audio.speech.create(
+    # TTS 생성 (응답 전체를 메모리에 올리지 않고 받는 대로 파일에 저장)
+    with client.audio.speech.with_streaming_response.create(
         model="tts-1",
         voice=voice,
         input=text,
+        response_format="mp3",
+    ) as response:
+        response.stream_to_file(filepath)
+
+    return filepath
+
+
+def _typecast_payload(
+    text: str,
+    actor_name: str,
+    emotion_tone_preset: str,
+    audio_format: str,
+    tempo: float,
+    volume: int,
+    pitch: int,
+) -> str:
+    """Typecast 음성 생성 요청 본문(JSON 문자열)을 만듭니다. 지원하지 않는 액터면 ValueError."""
+    # 액터 이름을 ID로 변환
+    actor_id = TYPECAST_ACTORS.get(actor_name)
+    if actor_id is None:
+        raise ValueError(
+            f"지원하지 않는 액터 이름입니다: {actor_name}. 사용 가능한 액터: {_AVAILABLE_ACTORS}"
+        )
+
+    return json.dumps(
+        {
+            "actor_id": actor_id,
+            "text": text,
+            "lang": "auto",
+            "tempo": tempo,
+            "volume": volume,
+            "pitch": pitch,
+            "xapi_hd": True,
+            "max_seconds": 60,
+            "model_version": "latest",
+            "xapi_audio_format": audio_format,
+            "emotion_tone_preset": emotion_tone_preset,
+        }
     )
 
-    # 파일로 저장
-    with open(filepath, "wb") as f:
-        f.write(response.content)
 
-    return filepath
+def _poll_delay(attempt: int) -> float:
+    """폴링 간격. 처음에는 짧게, 이후에는 최대 2초까지 점점 길게 기다림"""
+    return min(2.0, 0.2 * (1.5 ** attempt))
+
+
+def _retry_delay(response, attempt: int) -> float:
+    """Retry-After 헤더가 있으면 그 시간을, 없으면 _retry와 같은 지터 섞인 지수 백오프 시간을 반환합니다."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        return _retry.parse_retry_after(retry_after)
+    return _retry.backoff_factor * (2 ** attempt) + random.uniform(0, _retry.backoff_jitter)
+
+
+def _post_speak(payload: bytes) -> requests.Response:
+    """
+    음성 생성 요청을 보냅니다.
+
+    429는 서버가 작업을 만들지 않고 거절한 응답이므로, 이 경우에만 Retry-After(없으면 _retry와 같은 백오프)만큼
+    기다렸다가 다시 보냅니다. 그 외 응답은 중복 작업이 생길 수 있으므로 그대로 반환합니다.
+    """
+    for attempt in range(TYPECAST_SPEAK_429_RETRIES + 1):
+        response = _session.post(
+            TYPECAST_API_URL, headers=_TYPECAST_HEADERS, data=payload, timeout=TYPECAST_TIMEOUT
+        )
+        if response.status_code != 429 or attempt == TYPECAST_SPEAK_429_RETRIES:
+            return response
+        time.sleep(_retry_delay(response, attempt))
+    return response
+
+
+async def _post_speak_async(payload: bytes):
+    """_post_speak의 비동기 버전. 429일 때만 기다렸다가 다시 보냅니다."""
+    for attempt in range(TYPECAST_SPEAK_429_RETRIES + 1):
+        response = await _post_speak_async(payload)
+        if response.status_code != 429 or attempt == TYPECAST_SPEAK_429_RETRIES:
+            return response
+        await asyncio.sleep(_retry_delay(response, attempt))
+    return response
+
+
+async def _get_async(url: str, **kwargs):
+    """
+    GET 요청을 보내고, 일시적인 오류(_retry.status_forcelist)는 _retry와 같은 규칙으로 재시도합니다.
+
+    동기 세션의 재시도와 맞추기 위한 것으로, 재시도를 다 써도 실패하면 마지막 응답을 그대로 반환합니다.
+    """
+    for attempt in range(_retry.total + 1):
+        response = await http_client.get(url, **kwargs)
+        if response.status_code not in _retry.status_forcelist or attempt == _retry.total:
+            return response
+        await asyncio.sleep(_retry_delay(response, attempt))
+    return response
 
 
 def generate_typecast_tts_audio(
@@ -88,46 +223,132 @@ def generate_typecast_tts_audio(
         ValueError: 지원하지 않는 액터 이름인 경우
     """
 
-    # 액터 이름을 ID로 변환
-    if actor_name not in TYPECAST_ACTORS:
-        available_actors = ", ".join(TYPECAST_ACTORS.keys())
-        raise ValueError(
-            f"지원하지 않는 액터 이름입니다: {actor_name}. 사용 가능한 액터: {available_actors}"
+    # UUID 기반 파일명 생성
+    filepath = os.path.join(AUDIO_DIR, f"{uuid.uuid4().hex}.{audio_format}")
+
+    # Typecast API 요청 페이로드 (액터 이름 검증 포함)
+    payload = _typecast_payload(
+        text, actor_name, emotion_tone_preset, audio_format, tempo, volume, pitch
+    )
+
+    # 음성 생성 요청
+    response = _post_speak(payload)
+
+    if response.status_code != 200:
+        raise Exception(
+            f"Typecast API 요청 실패: {response.status_code}, {response.text}"
         )
 
-    actor_id = TYPECAST_ACTORS[actor_name]
+    speak_url = response.json()["result"]["speak_v2_url"]
 
-    # UUID 기반 파일명 생성
-    unique_id = uuid.uuid4().hex
-    filename = f"{unique_id}.{audio_format}"
-    filepath = os.path.join(AUDIO_DIR, filename)
+    # 음성 생성 완료까지 폴링 (최대 TYPECAST_POLL_TIMEOUT초)
+    # 처음에는 짧게, 이후에는 점점 길게 기다려서 불필요한 폴링 요청을 줄임
+    deadline = time.monotonic() + TYPECAST_POLL_TIMEOUT
+    attempt = 0
+    while time.monotonic() < deadline:
+        poll_response = _session.get(speak_url, headers=_TYPECAST_HEADERS, timeout=TYPECAST_TIMEOUT)
 
-    # print(actor_id)
+        if poll_response.status_code != 200:
+            raise Exception(f"폴링 요청 실패: {poll_response.status_code}")
 
-    # Typecast API 요청 페이로드
-    payload = json.dumps(
-        {
-            "actor_id": actor_id,
-            "text": text,
-            "lang": "auto",
-            "tempo": tempo,
-            "volume": volume,
-            "pitch": pitch,
-            "xapi_hd": True,
-            "max_seconds": 60,
-            "model_version": "latest",
-            "xapi_audio_format": audio_format,
-            "emotion_tone_preset": emotion_tone_preset,
-        }
-    )
+        result = poll_response.json()["result"]
+
+        if result["status"] == "done":
+            # 오디오 파일을 받는 대로 파일에 저장
+            with _session.get(
+                result["audio_download_url"], stream=True, timeout=TYPECAST_TIMEOUT
+            ) as audio_response:
+                if audio_response.status_code != 200:
+                    raise Exception(f"오디오 다운로드 실패: {audio_response.status_code}")
+
+                with open(filepath, "wb") as f:
+                    for chunk in audio_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
+            return filepath
+
+        elif result["status"] == "failed":
+            raise Exception(
+                f"음성 생성 실패: {result.get('message', '알 수 없는 오류')}"
+            )
+
+        else:
+            delay = _poll_delay(attempt)
+            attempt += 1
+            print(f"상태: {result['status']}, {delay:.1f}초 후 재시도...")
+            time.sleep(delay)
+
+    raise Exception(f"음성 생성 시간 초과 ({TYPECAST_POLL_TIMEOUT}초)")
+
+
+def generate_typecast_tts_audio_batch(
+    texts: list[str], return_exceptions: bool = False, **kwargs
+) -> list:
+    """
+    여러 텍스트를 Typecast로 동시에 음성 변환합니다. (최대 TYPECAST_CONCURRENCY개씩 동시 진행)
+
+    각 텍스트의 생성 요청과 폴링이 겹쳐서 진행되므로 장면 수만큼 순서대로 기다리지 않습니다.
+
+    Args:
+        texts (list[str]): 음성으로 변환할 텍스트 리스트
+        return_exceptions (bool): True이면 실패한 텍스트 위치에 예외 객체를 담아 반환
+        **kwargs: generate_typecast_tts_audio에 전달할 옵션 (actor_name, emotion_tone_preset 등)
+
+    Returns:
+        list: 입력 순서대로 저장된 오디오 파일 경로 리스트
+              (return_exceptions=True이면 실패한 위치는 예외 객체)
+
+    Raises:
+        Exception: return_exceptions=False이고 하나라도 음성 생성에 실패한 경우
+    """
+    if not texts:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(TYPECAST_CONCURRENCY, len(texts))) as executor:
+        futures = [
+            executor.submit(generate_typecast_tts_audio, text, **kwargs)
+            for text in texts
+        ]
+        if not return_exceptions:
+            return [future.result() for future in futures]
+        return [future.exception() or future.result() for future in futures]
+
+
+async def generate_typecast_tts_audio_async(
+    text: str,
+    actor_name: str = "현주",
+    emotion_tone_preset: str = "normal-1",
+    audio_format: str = "wav",
+    tempo: float = 1.0,
+    volume: int = 100,
+    pitch: int = 0,
+) -> str:
+    """
+    generate_typecast_tts_audio의 비동기 버전. 폴링하는 동안 이벤트 루프를 막지 않습니다.
+
+    Args:
+        text (str): 음성으로 변환할 텍스트
+        actor_name (str): 사용할 음성 액터 이름 (현주, 지윤, 한준, 진우, 찬구)
+        emotion_tone_preset (str): 감정 톤 프리셋 (예: angry-1, happy-1 등)
+        audio_format (str): 오디오 포맷 (wav 또는 mp3)
+        tempo (float): 음성 속도 (기본값: 1.0)
+        volume (int): 음량 (0-100, 기본값: 100)
+        pitch (int): 음높이 (-100 ~ 100, 기본값: 0)
+
+    Returns:
+        str: 저장된 오디오 파일의 경로
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {TYPECAST_API_KEY}",
-    }
+    Raises:
+        Exception: API 요청 실패 또는 음성 생성 실패 시
+        ValueError: 지원하지 않는 액터 이름인 경우
+    """
+    filepath = os.path.join(AUDIO_DIR, f"{uuid.uuid4().hex}.{audio_format}")
+    payload = _typecast_payload(
+        text, actor_name, emotion_tone_preset, audio_format, tempo, volume, pitch
+    )
 
     # 음성 생성 요청
-    response = requests.post(TYPECAST_API_URL, headers=headers, data=payload)
+    response = await _post_speak_async(payload)
 
     if response.status_code != 200:
         raise Exception(
@@ -136,9 +357,11 @@ def generate_typecast_tts_audio(
 
     speak_url = response.json()["result"]["speak_v2_url"]
 
-    # 음성 생성 완료까지 폴링 (최대 120초)
-    for attempt in range(120):
-        poll_response = requests.get(speak_url, headers=headers)
+    # 음성 생성 완료까지 폴링 (최대 TYPECAST_POLL_TIMEOUT초)
+    deadline = time.monotonic() + TYPECAST_POLL_TIMEOUT
+    attempt = 0
+    while time.monotonic() < deadline:
+        poll_response = await _get_async(speak_url, headers=_TYPECAST_HEADERS)
 
         if poll_response.status_code != 200:
             raise Exception(f"폴링 요청 실패: {poll_response.status_code}")
@@ -146,15 +369,14 @@ def generate_typecast_tts_audio(
         result = poll_response.json()["result"]
 
         if result["status"] == "done":
-            # 오디오 파일 다운로드
-            audio_response = requests.get(result["audio_download_url"])
-
-            if audio_response.status_code != 200:
-                raise Exception(f"오디오 다운로드 실패: {audio_response.status_code}")
+            # 오디오 파일을 받는 대로 파일에 저장
+            async with http_client.stream("GET", result["audio_download_url"]) as audio_response:
+                if audio_response.status_code != 200:
+                    raise Exception(f"오디오 다운로드 실패: {audio_response.status_code}")
 
-            # 파일로 저장
-            with open(filepath, "wb") as f:
-                f.write(audio_response.content)
+                async with aiofiles.open(filepath, "wb") as f:
+                    async for chunk in audio_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await f.write(chunk)
 
             return filepath
 
@@ -164,7 +386,8 @@ def generate_typecast_tts_audio(
             )
 
         else:
-            print(f"상태: {result['status']}, 1초 후 재시도...")
-            time.sleep(0.3)
+            delay = _poll_delay(attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
 
-    raise Exception("음성 생성 시간 초과 (120초)")
+    raise Exception(f"음성 생성 시간 초과 ({TYPECAST_POLL_TIMEOUT}초)")
@@ -0,0 +1,50 @@
+import os
+import threading
+
+
+class UploadsIndex:
+    """
+    업로드 폴더의 파일명 목록을 메모리에 저장해 두는 인덱스입니다.
+
+    영상 선택 시 후보마다 os.path.exists를 호출하는 대신 집합 조회로 확인합니다.
+    폴더의 수정 시각(mtime_ns)이 바뀌었을 때만 목록을 다시 읽으므로,
+    확인할 때마다 드는 파일 시스템 호출은 폴더 stat 한 번뿐입니다.
+
+    Args:
+        directory (str): 인덱싱할 폴더 경로
+    """
+
+    def __init__(self, directory: str = "uploads"):
+        self.directory = directory
+        self._mtime_ns = None
+        self._names = frozenset()
+        self._lock = threading.Lock()
+
+    def _refresh(self, force: bool = False) -> frozenset:
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return frozenset()
+
+        with self._lock:
+            if force or mtime_ns != self._mtime_ns:
+                self._names = frozenset(
+                    entry.name for entry in os.scandir(self.directory) if entry.is_file()
+                )
+                self._mtime_ns = mtime_ns
+            return self._names
+
+    def contains(self, file_name: str) -> bool:
+        """파일이 업로드 폴더에 있는지 확인합니다."""
+        if file_name in self._refresh():
+            return True
+
+        # 같은 mtime 단위 안에서 추가된 파일은 목록에 없을 수 있으므로, 없을 때만 직접 확인
+        if os.path.exists(os.path.join(self.directory, file_name)):
+            self._refresh(force=True)
+            return True
+        return False
+
+
+# 전역 업로드 폴더 인덱스 인스턴스
+uploads_index = UploadsIndex()
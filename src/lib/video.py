@@ -1,10 +1,63 @@
+import av
 import base64
+import hashlib
 import cv2
 import requests
 import shutil
 import os
 from google.genai import types
 from src.lib.llm import gemini_client
+from src.db import get_video_description, save_video_description
+
+# 프레임/썸네일 저장 폴더 (요청 처리 중이 아니라 모듈 로드 시 한 번만 생성)
+FRAMES_DIR = "frames"
+THUMBNAILS_DIR = "thumbnails"
+os.makedirs(FRAMES_DIR, exist_ok=True)
+os.makedirs(THUMBNAILS_DIR, exist_ok=True)
+
+# 정확 모드에서 탐색 없이 이어서 디코딩할 최대 간격(초). 일반적인 GOP 길이 수준
+SEQUENTIAL_DECODE_MAX_GAP = 2.0
+
+# 분석용 프레임의 최대 변 길이와 JPEG 품질 (모델이 어차피 축소해서 보므로 원본 해상도는 불필요)
+FRAME_MAX_EDGE = 768
+FRAME_JPEG_QUALITY = 80
+
+# 영상 설명 생성에 사용하는 모델
+VIDEO_CAPTION_MODEL = "gemini-2.5-flash-preview-05-20"
+
+# 영상 지문 계산 시 앞/뒤에서 읽는 크기
+FINGERPRINT_CHUNK_SIZE = 1 << 20
+
+# 썸네일 가로 크기 (세로는 비율 유지)
+THUMBNAIL_WIDTH = 320
+
+# 비디오 다운로드 시 한 번에 복사하는 크기
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# 비디오 다운로드 (연결, 읽기) 타임아웃 (초). 응답이 멈춘 서버가 업로드 워커를 계속 붙잡지 않도록 함
+DOWNLOAD_TIMEOUT = (5, 60)
+
+
+def _open_capture(video_path):
+    """FFmpeg 백엔드로 VideoCapture를 엽니다.
+
+    백엔드를 지정해 포맷 자동 감지 과정을 건너뛰고, 한두 프레임만 읽으므로
+    내부 프레임 버퍼를 1로 줄입니다.
+
+    Parameters
+    ----------
+    video_path : str
+        열 비디오 파일의 경로입니다.
+
+    Returns
+    -------
+    cv2.VideoCapture
+        열린 VideoCapture 객체입니다.
+    """
+    vidcap = cv2.VideoCapture(str(video_path), cv2.CAP_FFMPEG)
+    vidcap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return vidcap
+
 
 # Function to encode the image
 def encode_image(image_path):
@@ -20,15 +73,147 @@ def encode_image(image_path):
     str
         Base64로 인코딩된 이미지 문자열입니다.
     """
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+    # base64 결과는 ASCII 문자만 포함하므로 utf-8 검증 없이 ascii로 디코딩
+    return base64.b64encode(_read_file(image_path)).decode("ascii")
+
+
+def _read_file(path):
+    """파일 전체를 bytes로 읽습니다."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _sample_frames(container, num_frames, exact=False):
+    """열린 컨테이너에서 균등한 간격으로 프레임을 디코딩합니다.
+
+    각 위치로는 PyAV의 키프레임 탐색으로 이동하므로 매번 처음부터 디코딩하지 않습니다.
+
+    Parameters
+    ----------
+    container : av.container.InputContainer
+        프레임을 읽을 열린 컨테이너입니다.
+    num_frames : int
+        추출할 프레임의 개수입니다.
+    exact : bool, optional
+        True이면 목표 시점의 프레임까지 디코딩합니다.
+        False(기본값)이면 목표 시점 직전의 키프레임을 그대로 사용합니다.
+
+    Returns
+    -------
+    list[numpy.ndarray]
+        디코딩된 BGR 이미지 리스트입니다. 첫 번째 항목은 영상의 첫 프레임입니다.
+    """
+    stream = container.streams.video[0]
+    if not exact:
+        # 키프레임만 디코딩 (ffmpeg -skip_frame nokey와 동일). 중간 프레임 디코딩 비용이 없고
+        # 압축 아티팩트가 적은 이미지가 나와 캡션 생성에도 유리함
+        stream.codec_context.skip_frame = "NONKEY"
+    start_pts = stream.start_time or 0
+    if stream.duration is not None:
+        duration_pts = stream.duration
+    else:
+        # 스트림 길이가 없는 포맷(webm 등)은 컨테이너 길이(마이크로초)를 스트림 단위로 변환
+        duration_pts = int(container.duration / av.time_base / stream.time_base)
+
+    max_gap_pts = int(SEQUENTIAL_DECODE_MAX_GAP / stream.time_base)
+    decoder = None
+    last_pts = None
+    used_pts = set()
+    images = []
+
+    for i in range(num_frames):
+        target_pts = start_pts + int(i * duration_pts / num_frames)
+
+        # 정확 모드에서 다음 목표가 가까우면 다시 탐색하지 않고 이어서 디코딩
+        # (키프레임으로 되돌아가 같은 GOP를 다시 디코딩하는 것보다 빠름)
+        sequential = (
+            exact
+            and decoder is not None
+            and last_pts is not None
+            and 0 <= target_pts - last_pts <= max_gap_pts
+        )
+        if not sequential:
+            container.seek(target_pts, any_frame=False, backward=True, stream=stream)
+            decoder = container.decode(stream)
+
+        for frame in decoder:
+            last_pts = frame.pts
+            # 키프레임 모드에서 짧은 영상이나 GOP가 긴 영상은 여러 목표가 같은 키프레임으로 이동하므로
+            # 이미 사용한 키프레임이면 다음 키프레임까지 이어서 디코딩
+            if not exact and frame.pts is not None and frame.pts in used_pts:
+                continue
+            # 지나치는 프레임은 디코딩만 하고 BGR 변환은 하지 않음 (cv2의 grab/retrieve와 같은 방식)
+            if not exact or frame.pts is None or frame.pts >= target_pts:
+                images.append(frame.to_ndarray(format="bgr24"))
+                used_pts.add(frame.pts)
+                break
+        else:
+            if not exact:
+                # 뒤에 남은 키프레임이 없으면 이 목표만 정확 모드로 디코딩
+                images.extend(_decode_exact_frame(container, stream, target_pts))
+                decoder = None
+
+    return images
+
+
+def _decode_exact_frame(container, stream, target_pts):
+    """키프레임 모드를 잠시 끄고 목표 시점의 프레임 하나를 디코딩합니다. (없으면 빈 리스트)"""
+    stream.codec_context.skip_frame = "DEFAULT"
+    try:
+        container.seek(target_pts, any_frame=False, backward=True, stream=stream)
+        for frame in container.decode(stream):
+            if frame.pts is None or frame.pts >= target_pts:
+                return [frame.to_ndarray(format="bgr24")]
+        return []
+    finally:
+        stream.codec_context.skip_frame = "NONKEY"
+
+
+def _resize_for_vision(image):
+    """긴 변이 FRAME_MAX_EDGE를 넘으면 비율을 유지하며 축소합니다."""
+    height, width = image.shape[:2]
+    scale = FRAME_MAX_EDGE / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(
+        image,
+        (max(1, round(width * scale)), max(1, round(height * scale))),
+        interpolation=cv2.INTER_AREA,
+    )
+
+
+def _encode_frame(image):
+    """프레임을 분석용 크기로 줄인 뒤 메모리에서 JPEG bytes로 인코딩합니다."""
+    ok, buffer = cv2.imencode(
+        ".jpg", _resize_for_vision(image), [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY]
+    )
+    if not ok:
+        raise Exception("프레임을 JPEG로 인코딩할 수 없습니다.")
+    return buffer.tobytes()
 
 
-def extract_frames(video_path, num_frames=3):
+def _write_frames(images, video_path):
+    """디코딩된 프레임들을 frames 폴더에 jpg 파일로 저장하고 경로 리스트를 반환합니다."""
+    # 여러 비디오를 동시에 처리해도 프레임 파일이 겹치지 않도록 비디오 이름을 포함
+    video_name = os.path.splitext(os.path.basename(str(video_path)))[0]
+    frames = []
+    for i, image in enumerate(images):
+        frame_path = f"{FRAMES_DIR}/{video_name}_frame_{i}.jpg"
+        cv2.imwrite(
+            frame_path,
+            _resize_for_vision(image),
+            [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY],
+        )
+        frames.append(frame_path)
+    return frames
+
+
+def extract_frames(video_path, num_frames=3, exact=False):
     """비디오에서 여러 프레임을 추출하여 이미지 파일로 저장합니다.
 
     비디오 전체 길이에서 균등한 간격으로 `num_frames`개의 프레임을 선택하여
-    jpg 이미지 파일로 저장합니다.
+    jpg 이미지 파일로 저장합니다. 각 위치로는 PyAV의 키프레임 탐색으로 이동하므로
+    매번 처음부터 디코딩하지 않습니다.
 
     Parameters
     ----------
@@ -36,31 +221,109 @@ def extract_frames(video_path, num_frames=3):
         프레임을 추출할 비디오 파일의 경로입니다.
     num_frames : int, optional
         추출할 프레임의 개수입니다. 기본값은 3입니다.
+    exact : bool, optional
+        True이면 목표 시점의 프레임까지 디코딩해서 정확한 프레임을 저장합니다.
+        False(기본값)이면 목표 시점 직전의 키프레임을 그대로 사용합니다.
+        썸네일/캡션 용도에는 키프레임으로 충분합니다.
 
     Returns
     -------
     list[str]
         저장된 프레임 이미지 파일들의 경로 리스트입니다.
     """
-    vidcap = cv2.VideoCapture(video_path)
-    total_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
-    frame_idxs = [int(i * total_frames / num_frames) for i in range(num_frames)]
-    frames = []
-    for idx in frame_idxs:
-        vidcap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        success, image = vidcap.read()
-        if success:
-            frame_path = f"frames/frame_{idx}.jpg"
-            cv2.imwrite(frame_path, image)
-            frames.append(frame_path)
-    vidcap.release()
-    return frames
+    container = av.open(str(video_path))
+    try:
+        images = _sample_frames(container, num_frames, exact)
+    finally:
+        container.close()
+
+    return _write_frames(images, video_path)
 
 
-def video_to_text(video_path, num_frames=3):
+def extract_frames_in_memory(video_path, num_frames=3, exact=False):
+    """비디오에서 여러 프레임을 추출하여 JPEG bytes로 반환합니다.
+
+    `extract_frames`와 같은 프레임을 고르지만 디스크에 쓰고 다시 읽지 않고
+    메모리에서 바로 인코딩합니다. 프레임을 분석 API에 보내기만 할 때 사용합니다.
+
+    Parameters
+    ----------
+    video_path : str
+        프레임을 추출할 비디오 파일의 경로입니다.
+    num_frames : int, optional
+        추출할 프레임의 개수입니다. 기본값은 3입니다.
+    exact : bool, optional
+        True이면 목표 시점의 정확한 프레임을, False(기본값)이면 직전 키프레임을 사용합니다.
+
+    Returns
+    -------
+    list[bytes]
+        JPEG로 인코딩된 프레임 리스트입니다.
+    """
+    container = av.open(str(video_path))
+    try:
+        images = _sample_frames(container, num_frames, exact)
+    finally:
+        container.close()
+
+    return [_encode_frame(image) for image in images]
+
+
+def extract_thumbnail_and_frames(video_path, num_frames=3, thumbnail_path=None):
+    """비디오를 한 번만 열어서 썸네일과 프레임 이미지들을 함께 추출합니다.
+
+    첫 번째 샘플 프레임이 영상의 첫 프레임이므로 썸네일을 위해 따로 디코딩하지 않습니다.
+    같은 영상에 `create_thumbnail`과 `extract_frames`를 각각 호출하면
+    파일을 두 번 열고 첫 프레임을 두 번 디코딩하게 되므로, 둘 다 필요할 때는 이 함수를 사용합니다.
+
+    Parameters
+    ----------
+    video_path : str
+        처리할 비디오 파일의 경로입니다.
+    num_frames : int, optional
+        추출할 프레임의 개수입니다. 기본값은 3입니다.
+    thumbnail_path : str, optional
+        썸네일을 저장할 경로입니다. None이면 자동 생성됩니다.
+
+    Returns
+    -------
+    tuple[str, list[bytes]]
+        저장된 썸네일 경로와 JPEG로 인코딩된 프레임 리스트입니다.
+    """
+    container = av.open(str(video_path))
+    try:
+        images = _sample_frames(container, max(1, num_frames))
+    finally:
+        container.close()
+
+    if not images:
+        raise Exception("비디오에서 프레임을 읽을 수 없습니다.")
+
+    thumbnail_path = _write_thumbnail(images[0], video_path, thumbnail_path)
+    return thumbnail_path, [_encode_frame(image) for image in images[:num_frames]]
+
+
+def _video_fingerprint(video_path):
+    """영상 파일의 크기와 앞/뒤 1MB로 내용 지문을 계산합니다.
+
+    전체 파일을 해시하지 않아도 같은 영상을 다시 올렸는지 구분하기에 충분합니다.
+    모델이 바뀌면 다른 설명이 나오므로 모델 이름도 함께 넣습니다.
+    """
+    size = os.path.getsize(video_path)
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(f"{VIDEO_CAPTION_MODEL}|{size}|".encode())
+    with open(video_path, "rb") as f:
+        hasher.update(f.read(FINGERPRINT_CHUNK_SIZE))
+        if size > FINGERPRINT_CHUNK_SIZE:
+            f.seek(max(FINGERPRINT_CHUNK_SIZE, size - FINGERPRINT_CHUNK_SIZE))
+            hasher.update(f.read(FINGERPRINT_CHUNK_SIZE))
+    return hasher.hexdigest()
+
+
+def video_to_text(video_path, num_frames=3, frames=None):
     """비디오의 주요 프레임들을 분석하여 텍스트 설명을 생성합니다.
 
-    `extract_frames` 함수를 사용하여 비디오에서 프레임들을 추출하고,
+    `extract_frames_in_memory` 함수를 사용하여 비디오에서 프레임들을 추출하고,
     Gemini API를 호출하여 각 프레임에 대한 설명을 생성합니다.
 
     Parameters
@@ -69,13 +332,24 @@ def video_to_text(video_path, num_frames=3):
         텍스트 설명을 생성할 비디오 파일의 경로입니다.
     num_frames : int, optional
         분석에 사용할 프레임의 개수입니다. 기본값은 3입니다.
+    frames : list[bytes], optional
+        이미 추출한 JPEG 프레임들입니다. (`extract_thumbnail_and_frames` 결과)
+        None이면 `extract_frames_in_memory`로 새로 추출합니다.
 
     Returns
     -------
     str
         생성된 비디오 설명 텍스트입니다.
     """
-    frame_paths = extract_frames(video_path, num_frames)
+    # 같은 영상은 이전에 생성한 설명을 재사용 (프레임 추출과 API 호출 모두 생략)
+    fingerprint = _video_fingerprint(video_path)
+    cached_text = get_video_description(fingerprint, num_frames)
+    if cached_text is not None:
+        print(f"♻️ 캐시된 영상 설명 사용: {video_path}")
+        return cached_text
+
+    if frames is None:
+        frames = extract_frames_in_memory(video_path, num_frames)
     
     # 콘텐츠 파츠 준비
     parts = [
@@ -95,12 +369,11 @@ Your output will be used for semantic search and automatic storyboard narration
 """)
     ]
     
-    # 각 프레임 이미지 추가
-    for frame_path in frame_paths:
-        base64_image = encode_image(frame_path)
+    # 각 프레임 이미지 추가 (Gemini SDK는 JPEG bytes를 그대로 받음)
+    for image in frames:
         parts.append(
             types.Part.from_bytes(
-                data=base64.b64decode(base64_image),
+                data=image,
                 mime_type="image/jpeg"
             )
         )
@@ -118,11 +391,14 @@ Your output will be used for semantic search and automatic storyboard narration
     
     # API 호출 및 응답 처리
     response = gemini_client.models.generate_content(
-        model="gemini-2.5-flash-preview-05-20",
+        model=VIDEO_CAPTION_MODEL,
         contents=contents,
         config=generate_content_config,
     )
-    
+
+    if response.text:
+        save_video_description(fingerprint, num_frames, response.text)
+
     return response.text
 
 
@@ -145,14 +421,36 @@ def download_video_from_url(url: str, save_path: str) -> str:
     ------
     requests.exceptions.HTTPError
         HTTP 요청이 실패했을 경우 발생합니다.
+    requests.exceptions.Timeout
+        연결 또는 데이터 수신이 DOWNLOAD_TIMEOUT을 넘긴 경우 발생합니다.
     """
-    with requests.get(url, stream=True) as r:
+    # 영상은 이미 압축된 데이터이므로 전송 압축을 요청하지 않고 받은 바이트를 그대로 기록
+    with requests.get(
+        url, stream=True, headers={"Accept-Encoding": "identity"}, timeout=DOWNLOAD_TIMEOUT
+    ) as r:
         r.raise_for_status()
+        r.raw.decode_content = False
         with open(save_path, "wb") as f:
-            shutil.copyfileobj(r.raw, f)
+            shutil.copyfileobj(r.raw, f, length=DOWNLOAD_CHUNK_SIZE)
     return save_path
 
 
+def _write_thumbnail(image, video_path, thumbnail_path=None):
+    """프레임 이미지를 썸네일 크기로 줄여서 저장하고 경로를 반환합니다."""
+    if thumbnail_path is None:
+        # 비디오 파일명을 기반으로 썸네일 경로 생성
+        video_name = video_path.stem if hasattr(video_path, 'stem') else video_path.split('/')[-1].split('.')[0]
+        thumbnail_path = f"{THUMBNAILS_DIR}/{video_name}_thumbnail.jpg"
+
+    # 썸네일 크기 조정 (예: 320x240). 축소에는 INTER_AREA가 더 빠르고 깔끔함
+    height, width = image.shape[:2]
+    new_height = max(1, THUMBNAIL_WIDTH * height // width)
+    resized_image = cv2.resize(image, (THUMBNAIL_WIDTH, new_height), interpolation=cv2.INTER_AREA)
+
+    cv2.imwrite(thumbnail_path, resized_image)
+    return thumbnail_path
+
+
 def create_thumbnail(video_path, thumbnail_path=None):
     """비디오의 첫 번째 프레임을 썸네일로 추출합니다.
 
@@ -168,36 +466,13 @@ def create_thumbnail(video_path, thumbnail_path=None):
     str
         저장된 썸네일 파일의 경로입니다.
     """
-    vidcap = cv2.VideoCapture(video_path)
+    vidcap = _open_capture(video_path)
     
     # 첫 번째 프레임을 읽기
     success, image = vidcap.read()
+    vidcap.release()
     
-    if success:
-        if thumbnail_path is None:
-            # 비디오 파일명을 기반으로 썸네일 경로 생성
-            video_name = video_path.stem if hasattr(video_path, 'stem') else video_path.split('/')[-1].split('.')[0]
-            thumbnail_path = f"thumbnails/{video_name}_thumbnail.jpg"
-        
-        # 썸네일 크기 조정 (예: 320x240)
-        height, width = image.shape[:2]
-        aspect_ratio = width / height
-        new_width = 320
-        new_height = int(new_width / aspect_ratio)
-        resized_image = cv2.resize(image, (new_width, new_height))
-        
-        cv2.imwrite(thumbnail_path, resized_image)
-        vidcap.release()
-        return thumbnail_path
-    else:
-        vidcap.release()
+    if not success:
         raise Exception("비디오에서 프레임을 읽을 수 없습니다.")
 
-
-
-
-
-
-    
-
-
+    return _write_thumbnail(image, video_path, thumbnail_path)
@@ -30,15 +30,23 @@
 from fastapi import APIRouter, Body, HTTPException, Query, BackgroundTasks
 from pydantic import BaseModel
 from typing import List, Optional, Union
-from src.lib.embedding import search_chroma
-from src.lib.tts import generate_typecast_tts_audio
-from src.lib.edit import create_composite_video, cleanup_video_resources
-from src.db import save_video_generation_info, get_video_generation_history, get_video_generation_by_id
+from src.lib.embedding import search_chroma, search_chroma_batch, get_metadata_by_file_names
+from src.lib.tts import generate_typecast_tts_audio_batch
+from src.lib.edit import create_composite_video, cleanup_video_resources, get_display_size
+from src.lib.uploads_index import uploads_index
+from src.db import save_video_generation_info, get_video_generation_history, count_video_generations, get_video_generation_by_id, delete_video_generation, pop_video_generation
 from src.db import save_task_info, update_task_info, get_task_info, get_all_tasks, delete_task_info  # 태스크 DB 함수들
+from src.db import next_counter
 from src.task_queue import get_task_queue, TaskStatus  # 태스크 큐
-from moviepy import VideoFileClip
 import os
 import re
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/ai")
 
@@ -70,34 +78,69 @@ class FlexibleScene(BaseModel):
 class FlexibleStoryRequest(BaseModel):
     story: List[FlexibleScene]
 
-def get_next_output_path():
-    output_dir = "output"
-    base_name = "final_edit"
-    ext = ".mp4"
-    pattern = re.compile(rf"{base_name}_(\d+){re.escape(ext)}")
+# 결과 영상 번호 (SQLite 카운터로 발급하므로 여러 프로세스가 동시에 호출해도 번호가 겹치지 않음)
+OUTPUT_DIR = "output"
+_output_lock = threading.Lock()
+_output_dir_scanned = False
+OUTPUT_PREFIX = "final_edit_"
+OUTPUT_COUNTER = "final_edit"
+_OUTPUT_NAME_PATTERN = re.compile(rf"{OUTPUT_PREFIX}(\d+){re.escape('.mp4')}")
+
+def _scan_next_output_idx():
     max_idx = 0
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    # 목록 전체를 만들지 않고 항목을 하나씩 읽으면서, 접두사가 다른 파일은 정규식 없이 건너뜀
+    with os.scandir(OUTPUT_DIR) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.startswith(OUTPUT_PREFIX):
+                continue
+            match = _OUTPUT_NAME_PATTERN.match(name)
+            if match:
+                idx = int(match.group(1))
+                if idx > max_idx:
+                    max_idx = idx
+
+    return max_idx + 1
 
-    for fname in os.listdir(output_dir):
-        match = pattern.match(fname)
-        if match:
-            idx = int(match.group(1))
-            if idx > max_idx:
-                max_idx = idx
+def get_next_output_path():
+    global _output_dir_scanned
+    with _output_lock:
+        # 프로세스마다 처음 한 번만 output 폴더를 스캔해 카운터가 기존 파일 번호보다 작지 않게 맞춤
+        floor = 1
+        if not _output_dir_scanned:
+            floor = _scan_next_output_idx()
+            _output_dir_scanned = True
+
+        output_path = f"{OUTPUT_DIR}/{OUTPUT_PREFIX}{next_counter(OUTPUT_COUNTER, floor)}.mp4"
+        # 다른 곳에서 파일이 생긴 경우에만 다시 스캔
+        if os.path.exists(output_path):
+            idx = next_counter(OUTPUT_COUNTER, _scan_next_output_idx())
+            output_path = f"{OUTPUT_DIR}/{OUTPUT_PREFIX}{idx}.mp4"
 
-    next_idx = max_idx + 1
-    return output_dir + "/" + f"{base_name}_{next_idx}{ext}"
+        return output_path
+
+@lru_cache(maxsize=4096)
+def _probe_orientation(video_path: str, mtime_ns: int, size: int) -> bool:
+    """
+    영상 방향을 확인합니다. 파일이 바뀌면 (mtime, size)가 달라지므로 캐시가 자동으로 갱신됩니다.
+    """
+    size = get_display_size(video_path)
+    if not size:
+        return False
+    width, height = size
+    return height > width
 
 def is_vertical_video(video_path: str) -> bool:
-    """영상이 세로 영상인지 확인합니다."""
+    """영상이 세로 영상인지 확인합니다. (같은 파일은 다시 읽지 않음)"""
     try:
-        with VideoFileClip(video_path) as clip:
-            width, height = clip.size
-            return height > width
+        stat = os.stat(video_path)
+        return _probe_orientation(video_path, stat.st_mtime_ns, stat.st_size)
     except Exception as e:
-        print(f"영상 정보 확인 중 오류: {video_path} - {e}")
+        logger.warning("영상 정보 확인 중 오류: %s - %s", video_path, e)
         return False
 
 def select_video_with_options(
@@ -120,8 +163,65 @@ def select_video_with_options(
     Returns:
         tuple: (선택된 파일명, 메타데이터)
     """
-    search_result = search_chroma(script, n_results=max_search_results)
+    search_result = search_chroma(
+        script,
+        n_results=max_search_results,
+        where=_exclude_used(used_videos) if avoid_duplicates else None
+    )
+    return _pick_video(search_result, used_videos, avoid_duplicates, filter_vertical)
+
+def _exclude_used(used_videos: set) -> Optional[dict]:
+    """이미 사용한 영상을 벡터 검색 단계에서 제외하는 메타데이터 필터를 만듭니다."""
+    if not used_videos:
+        return None
+    return {"file_name": {"$nin": sorted(used_videos)}}
+
+def _pick_video_or_requery(
+    query: str,
+    search_result: dict,
+    used_videos: set,
+    avoid_duplicates: bool = False,
+    filter_vertical: bool = False,
+    max_search_results: int = 10
+) -> tuple[str, dict]:
+    """
+    미리 가져온 검색 결과에서 영상을 고르고, 이미 사용한 영상 때문에 후보가 모자라면
+    사용한 영상을 제외한 조건으로 한 번 더 검색합니다.
+    """
+    try:
+        return _pick_video(search_result, used_videos, avoid_duplicates, filter_vertical)
+    except HTTPException:
+        if not (avoid_duplicates and used_videos):
+            raise
+    return select_video_with_options(
+        script=query,
+        used_videos=used_videos,
+        avoid_duplicates=avoid_duplicates,
+        filter_vertical=filter_vertical,
+        max_search_results=max_search_results
+    )
+
+def _pick_video(
+    search_result: dict,
+    used_videos: set,
+    avoid_duplicates: bool = False,
+    filter_vertical: bool = False
+) -> tuple[str, dict]:
+    """
+    검색 결과에서 옵션 조건을 만족하는 첫 번째 영상을 고릅니다.
     
+    검색(네트워크/임베딩)과 선택(중복/파일/방향 확인)을 나눠서,
+    여러 장면의 검색은 한 번에 묶어서 실행하고 선택은 장면 순서대로 할 수 있게 합니다.
+    
+    Args:
+        search_result: search_chroma 결과
+        used_videos: 이미 사용된 영상들의 파일명 집합
+        avoid_duplicates: 중복 영상 방지 여부
+        filter_vertical: 세로 영상 필터링 여부
+    
+    Returns:
+        tuple: (선택된 파일명, 메타데이터)
+    """
     if (
         not search_result["documents"]
         or not search_result["documents"][0]
@@ -141,14 +241,19 @@ def select_video_with_options(
         if avoid_duplicates and file_name in used_videos:
             continue
             
+        # 업로드 시 저장한 방향 정보로 먼저 거름 (파일 시스템 접근 없이 메모리에서 판단)
+        is_vertical = metadata.get("is_vertical") if filter_vertical else None
+        if is_vertical:
+            continue
+            
         video_path = f"uploads/{file_name}"
         
-        # 파일 존재 여부 확인
-        if not os.path.exists(video_path):
+        # 파일 존재 여부 확인 (업로드 폴더 인덱스로 후보마다 stat하지 않음)
+        if not uploads_index.contains(file_name):
             continue
             
-        # 세로 영상 필터링
-        if filter_vertical and is_vertical_video(video_path):
+        # 방향 정보가 없는 예전 영상만 파일을 열어 세로 영상 여부 확인
+        if filter_vertical and is_vertical is None and is_vertical_video(video_path):
             continue
             
         # 조건을 만족하는 영상 발견
@@ -184,37 +289,58 @@ def _async_edit_video(
         
         video_infos = []
         used_videos = set()
+        scenes = story_req_dict["story"]
         
-        for scene in story_req_dict["story"]:
-            try:
-                # 옵션에 따라 영상 선택
-                file_name, metadata = select_video_with_options(
-                    script=scene["script"],
-                    used_videos=used_videos,
-                    avoid_duplicates=avoid_duplicates,
-                    filter_vertical=filter_vertical,
-                    max_search_results=max_search_results
-                )
-                
-                # 사용된 영상 목록에 추가
-                if avoid_duplicates:
-                    used_videos.add(file_name)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            # 음성 생성은 영상 선택 결과와 무관하므로 먼저 시작해 검색/선택과 겹쳐서 진행
+            tts_future = executor.submit(
+                generate_typecast_tts_audio_batch,
+                [scene["subtitle"] for scene in scenes],
+                actor_name=actor_name
+            )
+            # 모든 장면의 검색을 한 번에 실행 (임베딩 요청 1회 + 벡터 검색 1회)
+            search_results = search_chroma_batch(
+                [scene["script"] for scene in scenes], max_search_results
+            )
+            
+            # 선택은 중복 방지 결과가 순서에 따라 달라지므로 장면 순서대로 진행
+            for scene, search_result in zip(scenes, search_results):
+                try:
+                    # 옵션에 따라 영상 선택
+                    file_name, metadata = _pick_video_or_requery(
+                        scene["script"],
+                        search_result,
+                        used_videos=used_videos,
+                        avoid_duplicates=avoid_duplicates,
+                        filter_vertical=filter_vertical,
+                        max_search_results=max_search_results
+                    )
                     
-            except Exception as e:
-                raise Exception(f"Scene {scene['scene']}: {str(e)}")
+                    # 사용된 영상 목록에 추가
+                    if avoid_duplicates:
+                        used_videos.add(file_name)
+                        
+                except Exception as e:
+                    raise Exception(f"Scene {scene['scene']}: {str(e)}")
 
-            # subtitle을 TTS로 변환
-            print(actor_name)
-            audio_path = generate_typecast_tts_audio(scene["subtitle"], actor_name)
+                # video_infos에 정보 추가
+                video_infos.append({
+                    "path": f"uploads/{file_name}",
+                    "audio_path": None,
+                    "text": scene["subtitle"],
+                    "scene": scene["scene"],
+                    "script": scene["script"]
+                })
 
-            # video_infos에 정보 추가
-            video_infos.append({
-                "path": f"uploads/{file_name}",
-                "audio_path": audio_path,
-                "text": scene["subtitle"],
-                "scene": scene["scene"],
-                "script": scene["script"]
-            })
+            # 모든 장면의 subtitle 음성 생성 결과 연결
+            audio_paths = tts_future.result()
+        finally:
+            # 실패 시 진행 중인 음성 생성을 기다리지 않음
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        for info, audio_path in zip(video_infos, audio_paths):
+            info["audio_path"] = audio_path
 
         # 영상과 오디오, 자막 합치기
         output_path = get_next_output_path()
@@ -278,6 +404,7 @@ def _async_edit_video_mixed(
     max_search_results: int = 10,
     skip_unresolved: bool = False,
     actor_name: Optional[str] = "현주",
+    trust_direct_file: bool = True,
     task_id: str = None
 ):
     """비동기 혼합 비디오 생성 처리 함수"""
@@ -290,6 +417,7 @@ def _async_edit_video_mixed(
             "filter_vertical": filter_vertical,
             "max_search_results": max_search_results,
             "skip_unresolved": skip_unresolved,
+            "trust_direct_file": trust_direct_file,
             "actor_name": actor_name,
             "async_processing": True
         }
@@ -298,80 +426,138 @@ def _async_edit_video_mixed(
         used_videos = set()
         skipped_scenes = []
         
-        for i, scene in enumerate(scenes_data):
-            file_name = None
-            metadata = {}
-            selection_method = None
-            
-            try:
-                # Scene 타입 감지 및 처리
-                if "video_file_name" in scene and scene.get("video_file_name"):
-                    selection_method = "direct_file"
-                    file_name = scene["video_file_name"]
-                    video_path = f"uploads/{file_name}"
-                    
-                    if not os.path.exists(video_path):
-                        raise ValueError(f"파일 '{file_name}'을 찾을 수 없습니다.")
-                    
-                    if avoid_duplicates and file_name in used_videos:
-                        raise ValueError("중복된 영상입니다.")
-                    if filter_vertical and is_vertical_video(video_path):
-                        raise ValueError("세로 영상입니다.")
-                
-                elif "search_keywords" in scene and scene.get("search_keywords"):
-                    selection_method = "keyword_search"
-                    search_query = " ".join(scene["search_keywords"])
-                    file_name, metadata = select_video_with_options(
-                        script=search_query,
-                        used_videos=used_videos,
-                        avoid_duplicates=avoid_duplicates,
-                        filter_vertical=filter_vertical,
-                        max_search_results=max_search_results
-                    )
-                
-                elif "script" in scene and scene.get("script"):
-                    selection_method = "script_search"
-                    file_name, metadata = select_video_with_options(
-                        script=scene["script"],
-                        used_videos=used_videos,
-                        avoid_duplicates=avoid_duplicates,
-                        filter_vertical=filter_vertical,
-                        max_search_results=max_search_results
-                    )
-                
-                else:
-                    raise ValueError("유효한 비디오 선택 방법이 제공되지 않았습니다.")
+        scene_indices = []
+        
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            # 음성은 장면 자막만 있으면 되므로 먼저 시작해 검색/선택과 겹쳐서 진행
+            # (건너뛴 장면의 음성은 합성에 쓰지 않음)
+            # 장면별로 실패를 처리할 수 있도록 실패한 장면은 예외 객체로 받음
+            tts_future = executor.submit(
+                generate_typecast_tts_audio_batch,
+                [scene["subtitle"] for scene in scenes_data],
+                return_exceptions=True,
+                actor_name=actor_name
+            )
+            # 검색이 필요한 장면(키워드/스크립트)을 모아 한 번에 검색 (임베딩 요청 1회 + 벡터 검색 1회)
+            search_queries = {}
+            for i, scene in enumerate(scenes_data):
+                if scene.get("video_file_name"):
+                    continue
+                if scene.get("search_keywords"):
+                    search_queries[i] = " ".join(scene["search_keywords"])
+                elif scene.get("script"):
+                    search_queries[i] = scene["script"]
+        
+            search_results = dict(zip(
+                search_queries,
+                search_chroma_batch(list(search_queries.values()), max_search_results)
+            ))
+        
+            # 직접 지정한 영상도 방향을 확인해야 하면 업로드 시 저장한 메타데이터를 한 번에 조회
+            direct_metadata = {}
+            if filter_vertical and not trust_direct_file:
+                direct_metadata = get_metadata_by_file_names(
+                    [scene["video_file_name"] for scene in scenes_data if scene.get("video_file_name")]
+                )
+        
+            for i, scene in enumerate(scenes_data):
+                file_name = None
+                metadata = {}
+                selection_method = None
+        
+                try:
+                    # Scene 타입 감지 및 처리
+                    if scene.get("video_file_name"):
+                        selection_method = "direct_file"
+                        file_name = scene["video_file_name"]
+                        video_path = f"uploads/{file_name}"
                 
-                # 사용된 영상 추가
-                if avoid_duplicates:
-                    used_videos.add(file_name)
+                        if not uploads_index.contains(file_name):
+                            raise ValueError(f"파일 '{file_name}'을 찾을 수 없습니다.")
                 
-            except Exception as e:
-                if skip_unresolved:
-                    skipped_scenes.append({
-                        "scene": scene.get("scene", i + 1),
-                        "reason": str(e),
-                        "selection_method": selection_method
-                    })
-                    continue
-                else:
-                    raise Exception(f"Scene {scene.get('scene', i + 1)}: {str(e)}")
+                        if avoid_duplicates and file_name in used_videos:
+                            raise ValueError("중복된 영상입니다.")
+                        # 사용자가 직접 고른 파일을 신뢰하면 방향 확인을 하지 않음
+                        if filter_vertical and not trust_direct_file:
+                            is_vertical = direct_metadata.get(file_name, {}).get("is_vertical")
+                            # 방향 정보가 없는 예전 영상만 파일을 열어 확인
+                            if is_vertical is None:
+                                is_vertical = is_vertical_video(video_path)
+                            if is_vertical:
+                                raise ValueError("세로 영상입니다.")
             
-            # TTS 생성 (전체 설정 actor_name 사용)
-            audio_path = generate_typecast_tts_audio(scene["subtitle"], actor_name)
+                    elif i in search_results:
+                        selection_method = (
+                            "keyword_search" if scene.get("search_keywords") else "script_search"
+                        )
+                        file_name, metadata = _pick_video_or_requery(
+                            search_queries[i],
+                            search_results[i],
+                            used_videos=used_videos,
+                            avoid_duplicates=avoid_duplicates,
+                            filter_vertical=filter_vertical,
+                            max_search_results=max_search_results
+                        )
             
-            # video_infos에 정보 추가
-            video_infos.append({
-                "path": f"uploads/{file_name}",
-                "audio_path": audio_path,
-                "text": scene["subtitle"],
-                "scene": scene.get("scene", i + 1),
-                "script": scene.get("script", ""),
-                "search_keywords": scene.get("search_keywords"),
-                "video_file_name": scene.get("video_file_name"),
-                "selection_method": selection_method,
-                "metadata": metadata
-            })
+                    else:
+                        raise ValueError("유효한 비디오 선택 방법이 제공되지 않았습니다.")
+            
+                    # 사용된 영상 추가
+                    if avoid_duplicates:
+                        used_videos.add(file_name)
+            
+                except Exception as e:
+                    if skip_unresolved:
+                        skipped_scenes.append({
+                            "scene": scene.get("scene", i + 1),
+                            "reason": str(e),
+                            "selection_method": selection_method
+                        })
+                        continue
+                    else:
+                        raise Exception(f"Scene {scene.get('scene', i + 1)}: {str(e)}")
+        
+                # video_infos에 정보 추가 (오디오는 음성 생성이 끝난 뒤 연결)
+                video_infos.append({
+                    "path": f"uploads/{file_name}",
+                    "audio_path": None,
+                    "text": scene["subtitle"],
+                    "scene": scene.get("scene", i + 1),
+                    "script": scene.get("script", ""),
+                    "search_keywords": scene.get("search_keywords"),
+                    "video_file_name": scene.get("video_file_name"),
+                    "selection_method": selection_method,
+                    "metadata": metadata
+                })
+                scene_indices.append(i)
+
+            if not video_infos:
+                raise Exception("처리할 수 있는 비디오가 없습니다.")
+
+            # 모든 장면의 subtitle 음성 생성 결과 연결 (전체 설정 actor_name 사용)
+            audio_paths = tts_future.result()
+        finally:
+            # 실패 시 진행 중인 음성 생성을 기다리지 않음
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        # 음성 생성에 실패한 장면은 영상 선택 실패와 같은 방식으로 처리
+        resolved_infos = []
+        for info, i in zip(video_infos, scene_indices):
+            audio_path = audio_paths[i]
+            if isinstance(audio_path, BaseException):
+                if not skip_unresolved:
+                    raise Exception(f"Scene {info['scene']}: 음성 생성 실패: {audio_path}")
+                skipped_scenes.append({
+                    "scene": info["scene"],
+                    "reason": f"음성 생성 실패: {audio_path}",
+                    "selection_method": info["selection_method"]
+                })
+                used_videos.discard(info["path"].removeprefix("uploads/"))
+                continue
+            info["audio_path"] = audio_path
+            resolved_infos.append(info)
+        video_infos = resolved_infos
         
         if not video_infos:
             raise Exception("처리할 수 있는 비디오가 없습니다.")
@@ -482,7 +668,7 @@ def _async_edit_video_mixed(
     response_description="태스크 ID와 초기 상태를 반환합니다.",
     tags=["Video Generation", "Async"]
 )
-def edit_video_async(
+async def edit_video_async(
     story_req: StoryRequest,
     actor_name: Optional[str] = "현주",
     avoid_duplicates: bool = Query(False, description="중복 영상 방지 여부"),
@@ -491,6 +677,9 @@ def edit_video_async(
 ):
     """비동기적으로 비디오를 생성합니다."""
     
+    # 요청 데이터는 한 번만 덤프해서 태스크 인자와 DB 기록에 함께 사용
+    story_dict = story_req.model_dump()
+    
     # 태스크 큐 가져오기
     queue = get_task_queue()
     
@@ -498,27 +687,21 @@ def edit_video_async(
     task_id = queue.add_task(
         task_func=_async_edit_video,
         task_kwargs={
-            "story_req_dict": story_req.model_dump(),
+            "story_req_dict": story_dict,
             "actor_name": actor_name,
             "avoid_duplicates": avoid_duplicates,
             "filter_vertical": filter_vertical,
-            "max_search_results": max_search_results,
-            "task_id": None  # 나중에 설정됨
+            "max_search_results": max_search_results
         },
-        task_type="video_generation"
+        task_type="video_generation",
+        pass_task_id=True
     )
     
-    # 태스크 ID를 함수 인자에 추가
-    task_info = queue.get_task_status(task_id)
-    if task_info:
-        with queue._lock:
-            queue.tasks[task_id]["kwargs"]["task_id"] = task_id
-    
-    # DB에 태스크 정보 저장
-    save_task_info(task_id, {
+    # DB에 태스크 정보 저장 (SQLite 쓰기는 이벤트 루프를 막지 않도록 스레드에서 실행)
+    await asyncio.to_thread(save_task_info, task_id, {
         "type": "video_generation",
         "status": TaskStatus.PENDING.value,
-        "request_data": story_req.model_dump(),
+        "request_data": story_dict,
         "options": {
             "avoid_duplicates": avoid_duplicates,
             "filter_vertical": filter_vertical,
@@ -585,25 +768,19 @@ def edit_video_async(
     response_description="태스크 ID와 초기 상태를 반환합니다.",
     tags=["Video Generation", "Async", "Mixed"]
 )
-def edit_video_mixed_async(
+async def edit_video_mixed_async(
     scenes: List[Union[Scene, CustomScene, FlexibleScene]],
     actor_name: Optional[str] = Query("현주", description="TTS 음성 배우 이름"),
     avoid_duplicates: bool = Query(False, description="중복 영상 방지 여부"),
     filter_vertical: bool = Query(False, description="세로 영상 필터링 여부"),
     max_search_results: int = Query(10, description="최대 검색 결과 수", ge=1, le=50),
-    skip_unresolved: bool = Query(False, description="해결되지 않는 씬 건너뛰기")
+    skip_unresolved: bool = Query(False, description="해결되지 않는 씬 건너뛰기"),
+    trust_direct_file: bool = Query(True, description="직접 지정한 영상은 세로 영상 필터링 없이 사용")
 ):
     """비동기적으로 혼합 비디오를 생성합니다."""
     
-    # 씬 데이터를 딕셔너리로 변환
-    scenes_data = []
-    for scene_data in scenes:
-        if hasattr(scene_data, 'model_dump'):
-            scenes_data.append(scene_data.model_dump())
-        elif hasattr(scene_data, 'dict'):
-            scenes_data.append(scene_data.dict())
-        else:
-            scenes_data.append(scene_data)
+    # 씬 데이터를 딕셔너리로 변환 (모두 검증된 Pydantic 모델이므로 바로 덤프, 값이 없는 필드는 제외)
+    scenes_data = [scene.model_dump(exclude_none=True) for scene in scenes]
     
     # 태스크 큐 가져오기
     queue = get_task_queue()
@@ -618,19 +795,14 @@ def edit_video_mixed_async(
             "filter_vertical": filter_vertical,
             "max_search_results": max_search_results,
             "skip_unresolved": skip_unresolved,
-            "task_id": None  # 나중에 설정됨
+            "trust_direct_file": trust_direct_file
         },
-        task_type="mixed_video_generation"
+        task_type="mixed_video_generation",
+        pass_task_id=True
     )
     
-    # 태스크 ID를 함수 인자에 추가
-    task_info = queue.get_task_status(task_id)
-    if task_info:
-        with queue._lock:
-            queue.tasks[task_id]["kwargs"]["task_id"] = task_id
-    
-    # DB에 태스크 정보 저장
-    save_task_info(task_id, {
+    # DB에 태스크 정보 저장 (SQLite 쓰기는 이벤트 루프를 막지 않도록 스레드에서 실행)
+    await asyncio.to_thread(save_task_info, task_id, {
         "type": "mixed_video_generation",
         "status": TaskStatus.PENDING.value,
         "request_data": {"scenes": scenes_data},
@@ -639,7 +811,8 @@ def edit_video_mixed_async(
             "avoid_duplicates": avoid_duplicates,
             "filter_vertical": filter_vertical,
             "max_search_results": max_search_results,
-            "skip_unresolved": skip_unresolved
+            "skip_unresolved": skip_unresolved,
+            "trust_direct_file": trust_direct_file
         }
     })
     
@@ -718,7 +891,7 @@ def edit_video_mixed_async(
     response_description="태스크의 현재 상태와 진행 정보를 반환합니다.",
     tags=["Task Management"]
 )
-def get_task_status(task_id: str):
+async def get_task_status(task_id: str):
     """태스크 상태를 조회합니다."""
     
     # 메모리 큐에서 상태 조회
@@ -797,7 +970,7 @@ def get_task_status(task_id: str):
     response_description="태스크 큐의 전체 상태 정보를 반환합니다.",
     tags=["Task Management"]
 )
-def get_queue_status():
+async def get_queue_status():
     """태스크 큐 상태를 조회합니다."""
     
     queue = get_task_queue()
@@ -839,7 +1012,7 @@ def get_queue_status():
     response_description="삭제 결과를 반환합니다.",
     tags=["Task Management"]
 )
-def delete_task(task_id: str):
+async def delete_task(task_id: str):
     """태스크를 삭제합니다."""
     
     queue = get_task_queue()
@@ -857,7 +1030,7 @@ def delete_task(task_id: str):
             del queue.tasks[task_id]
     
     # DB에서 삭제
-    delete_task_info(task_id)
+    await asyncio.to_thread(delete_task_info, task_id)
     
     return {
         "result": "success",
@@ -912,34 +1085,17 @@ def get_video_history(
     이전에 생성된 비디오들의 히스토리를 가져옵니다.
     """
     try:
-        all_records = get_video_generation_history()
-        
-        # 최신순으로 정렬 (created_at 기준 내림차순)
-        sorted_records = sorted(
-            all_records, 
-            key=lambda x: x.get('created_at', ''), 
-            reverse=True
-        )
-        
-        # offset과 limit 적용
-        if offset:
-            sorted_records = sorted_records[offset:]
-        
-        if limit:
-            sorted_records = sorted_records[:limit]
-        
-        # 각 레코드에 doc_id 추가 (TinyDB의 내부 ID)
-        for record in sorted_records:
-            if hasattr(record, 'doc_id'):
-                record['id'] = record.doc_id
+        # 최신순 정렬과 offset/limit은 DB에서 처리 (필요한 페이지만 읽음)
+        records = get_video_generation_history(limit=limit, offset=offset)
+        total_count = count_video_generations()
         
         return {
             "result": "success",
-            "total_count": len(all_records),
-            "returned_count": len(sorted_records),
+            "total_count": total_count,
+            "returned_count": len(records),
             "offset": offset,
             "limit": limit,
-            "history": sorted_records
+            "history": records
         }
         
     except Exception as e:
@@ -1000,9 +1156,6 @@ def get_video_by_id(record_id: int):
         if not record:
             raise HTTPException(status_code=404, detail="해당 ID의 기록을 찾을 수 없습니다.")
         
-        # doc_id 추가
-        record['id'] = record_id
-        
         # 파일 존재 여부 확인
         output_path = record.get('output_path')
         file_exists = os.path.exists(output_path) if output_path else False
@@ -1018,6 +1171,101 @@ def get_video_by_id(record_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"기록 조회 중 오류: {e}")
 
+@router.post("/video_regenerate/{record_id}",
+    summary="🔁 이전 기록으로 비디오 재생성",
+    description="""
+    **이전에 저장된 기록의 원본 요청 데이터를 사용하여 새로운 옵션으로 비디오를 다시 생성합니다.**
+    
+    ## 주요 기능
+    - 이전 기록의 원본 요청 데이터 재사용 (일반/혼합 생성 기록 모두 지원)
+    - 새로운 생성 옵션 적용 가능
+    - 비동기 생성 API와 같은 큐에서 처리되며 즉시 태스크 ID 반환
+    
+    ## 사용 예시
+    ```
+    POST /api/ai/video_regenerate/1?avoid_duplicates=true&filter_vertical=true
+    ```
+    
+    ## 응답 예시
+    ```json
+    {
+      "result": "success",
+      "task_id": "550e8400-e29b-41d4-a716-446655440000",
+      "status": "pending",
+      "message": "비디오 재생성 작업이 큐에 추가되었습니다.",
+      "source_record_id": 1
+    }
+    ```
+    
+    ## 참고
+    - 저장된 요청 데이터는 생성 시 이미 검증된 값이므로 Pydantic 모델로 다시 변환하지 않고 그대로 사용합니다
+    - 혼합 생성 기록은 원래 사용한 skip_unresolved, trust_direct_file 옵션을 유지합니다
+    """,
+    response_description="태스크 ID와 초기 상태를 반환합니다.",
+    tags=["Video Generation", "Video History", "Async"]
+)
+async def regenerate_video_from_history(
+    record_id: int,
+    actor_name: Optional[str] = "현주",
+    avoid_duplicates: bool = Query(False, description="중복 영상 방지 여부"),
+    filter_vertical: bool = Query(False, description="세로 영상 필터링 여부"),
+    max_search_results: int = Query(10, description="최대 검색 결과 수", ge=1, le=50)
+):
+    """
+    이전 기록의 원본 요청 데이터로 비디오 생성 태스크를 다시 큐에 추가합니다.
+    """
+    record = await asyncio.to_thread(get_video_generation_by_id, record_id)
+    
+    if not record:
+        raise HTTPException(status_code=404, detail="해당 ID의 기록을 찾을 수 없습니다.")
+    
+    # 저장된 요청은 dict 그대로 워커에 전달 (StoryRequest로 다시 검증하고 덤프하지 않음)
+    story_request = record.get('story_request') or {}
+    previous_options = record.get('generation_options') or {}
+    options = {
+        "avoid_duplicates": avoid_duplicates,
+        "filter_vertical": filter_vertical,
+        "max_search_results": max_search_results,
+        "actor_name": actor_name
+    }
+    
+    if story_request.get("story"):
+        task_type = "video_generation"
+        task_func = _async_edit_video
+        task_kwargs = {"story_req_dict": story_request, **options}
+    elif story_request.get("scenes"):
+        task_type = "mixed_video_generation"
+        task_func = _async_edit_video_mixed
+        options["skip_unresolved"] = previous_options.get("skip_unresolved", False)
+        options["trust_direct_file"] = previous_options.get("trust_direct_file", True)
+        task_kwargs = {"scenes_data": story_request["scenes"], **options}
+    else:
+        raise HTTPException(status_code=400, detail="해당 기록에 원본 요청 데이터가 없습니다.")
+    
+    queue = get_task_queue()
+    task_id = queue.add_task(
+        task_func=task_func,
+        task_kwargs=task_kwargs,
+        task_type=task_type,
+        pass_task_id=True
+    )
+    
+    await asyncio.to_thread(save_task_info, task_id, {
+        "type": task_type,
+        "status": TaskStatus.PENDING.value,
+        "request_data": story_request,
+        "options": {**options, "source_record_id": record_id}
+    })
+    
+    return {
+        "result": "success",
+        "task_id": task_id,
+        "status": "pending",
+        "message": "비디오 재생성 작업이 큐에 추가되었습니다.",
+        "source_record_id": record_id,
+        "queue_position": queue.get_queue_status()["pending"]
+    }
+
 @router.delete("/video_history/{record_id}",
     summary="비디오 생성 기록 삭제",
     description="""
@@ -1059,23 +1307,26 @@ def delete_video_record(record_id: int, delete_file: bool = Query(False, descrip
     특정 ID의 비디오 생성 기록을 삭제합니다.
     """
     try:
-        record = get_video_generation_by_id(record_id)
+        # 파일을 지울 때만 output_path가 필요하므로, 그렇지 않으면 조회 없이 바로 삭제
+        if delete_file:
+            record = pop_video_generation(record_id)
+            deleted = record is not None
+        else:
+            deleted = delete_video_generation(record_id)
         
-        if not record:
+        if not deleted:
             raise HTTPException(status_code=404, detail="해당 ID의 기록을 찾을 수 없습니다.")
         
-        # 실제 파일 삭제 옵션
+        # 실제 파일 삭제 옵션 (기록은 이미 삭제되었으므로 파일 삭제 실패는 기록만 남김)
         if delete_file:
             output_path = record.get('output_path')
-            if output_path and os.path.exists(output_path):
+            if output_path:
                 try:
                     os.remove(output_path)
+                except FileNotFoundError:
+                    pass
                 except Exception as e:
-                    print(f"파일 삭제 중 오류: {output_path} - {e}")
-        
-        # DB에서 기록 삭제
-        from src.db import video_db
-        video_db.remove(doc_ids=[record_id])
+                    logger.warning("파일 삭제 중 오류: %s - %s", output_path, e)
         
         return {
             "result": "success",
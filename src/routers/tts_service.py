@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from src.lib.tts import generate_typecast_tts_audio
+from src.lib.tts import generate_typecast_tts_audio_async
 
 router = APIRouter(prefix="/api/tts")
 
@@ -9,6 +9,6 @@ class TTSRequest(BaseModel):
     actor_name: str = "현주"
 
 @router.post("/generate")
-def tts_endpoint(request: TTSRequest):
-    file_path = generate_typecast_tts_audio(request.text, request.actor_name)
+async def tts_endpoint(request: TTSRequest):
+    file_path = await generate_typecast_tts_audio_async(request.text, request.actor_name)
     return {"file_path": file_path}
@@ -3,12 +3,16 @@ from fastapi.responses import JSONResponse
 from pathlib import Path
 import uuid
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import aiofiles
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-from src.lib.embedding import add_to_chroma, search_chroma
-from src.lib.video import video_to_text, download_video_from_url, create_thumbnail
+from src.lib.embedding import add_to_chroma, search_chroma, search_chroma_mmr
+from src.lib.video import video_to_text, download_video_from_url, extract_thumbnail_and_frames
+from src.lib.edit import probe_media, display_size
 from src.db import save_video_url, check_url_exists, get_all_video_urls, delete_video_url
+from src.db import save_task_info, update_task_info, get_task_info
+from src.task_queue import get_upload_queue, TaskStatus, QueueFullError
 
 router = APIRouter(
     prefix="/api/video",
@@ -23,6 +27,33 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 THUMBNAIL_DIR = Path("thumbnails")
 THUMBNAIL_DIR.mkdir(exist_ok=True)
 
+# 업로드 파일을 디스크에 기록할 때 사용하는 청크 크기
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# 업로드 큐에 등록되어 처리 중인 URL (url -> {"task_id", "file_name"})
+# 처리가 끝나기 전에는 video_url_db에 기록이 없으므로 같은 URL이 다시 등록되는 것을 막기 위해 사용
+_pending_urls: Dict[str, Dict[str, str]] = {}
+_pending_lock = threading.Lock()
+
+def _media_metadata(file_path) -> dict:
+    """
+    영상 길이, 크기와 방향을 벡터 DB 메타데이터로 만듭니다. (컨테이너 헤더를 한 번만 읽음)
+
+    영상 생성 시 세로 영상 필터링에서 파일을 다시 열지 않고 이 값을 사용합니다.
+    """
+    try:
+        info = probe_media(str(file_path))
+    except Exception as e:
+        print(f"영상 정보 확인 중 오류: {file_path} - {e}")
+        return {}
+
+    metadata = {"duration": info["duration"]}
+    size = display_size(info)
+    if size:
+        width, height = size
+        metadata.update({"width": width, "height": height, "is_vertical": height > width})
+    return metadata
+
 # Response Models
 class VideoUploadResponse(BaseModel):
     status: str
@@ -49,22 +80,25 @@ class DeleteResponse(BaseModel):
     status: str
     message: str
 
+class VideoUrlBatchRequest(BaseModel):
+    urls: List[str]
+
 @router.post(
     "/upload",
     response_model=VideoUploadResponse,
-    summary="비디오 파일 업로드 (병렬 처리)",
+    summary="비디오 파일 업로드",
     description="""
-    로컬 비디오 파일을 업로드하고 병렬 처리로 최적화된 성능을 제공합니다.
+    로컬 비디오 파일을 업로드하고 텍스트 설명, 썸네일, 벡터 임베딩을 생성합니다.
     
-    **병렬 처리 최적화:**
-    - 텍스트 추출과 썸네일 생성을 동시에 실행
-    - 전체 처리 시간 단축
-    - 서버 리소스 효율적 활용
+    **단일 디코딩 처리:**
+    - 영상을 한 번만 열고 디코딩해서 썸네일과 분석용 프레임을 함께 추출
+    - 추출한 프레임으로 바로 텍스트를 생성하므로 영상을 다시 디코딩하지 않음
     
     **처리 과정:**
     1. 업로드된 파일을 서버에 저장
-    2. 텍스트 추출 + 썸네일 생성 (병렬 실행)
-    3. 벡터 임베딩 생성 및 ChromaDB에 저장
+    2. 썸네일 + 분석용 프레임 추출 (디코딩 1회)
+    3. 추출한 프레임으로 텍스트 생성
+    4. 벡터 임베딩 생성 및 ChromaDB에 저장
     
     **지원 형식:** MP4, AVI, MOV, WMV 등 일반적인 비디오 형식
     """,
@@ -96,56 +130,40 @@ async def upload_file(
     
     file_name = f"{uuid.uuid4()}_{file.filename}"
 
-    # 파일 저장
+    # 파일 저장 (1MB 단위로 나눠 비동기로 기록)
     file_path = UPLOAD_DIR / file_name
-    with open(file_path, "wb") as buffer:
-        content = file.file.read()
-        buffer.write(content)
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await buffer.write(chunk)
 
     # 썸네일 경로 준비
     thumbnail_name = f"{file_path.stem}_thumbnail.jpg"
     thumbnail_path = THUMBNAIL_DIR / thumbnail_name
 
-    # 병렬 처리: 텍스트 추출과 썸네일 생성을 동시에 실행
-    executor = ThreadPoolExecutor(max_workers=2)
-    loop = asyncio.get_event_loop()
-    
+    loop = asyncio.get_running_loop()
+
+    # 영상을 한 번만 디코딩해서 썸네일과 분석용 프레임을 함께 추출
     try:
-        # 텍스트 추출과 썸네일 생성을 병렬로 실행
-        text_task = loop.run_in_executor(executor, video_to_text, file_path)
-        thumbnail_task = loop.run_in_executor(executor, create_thumbnail, file_path, str(thumbnail_path))
-        
-        # 두 작업이 모두 완료될 때까지 대기
-        text, thumbnail_result = await asyncio.gather(text_task, thumbnail_task, return_exceptions=True)
-        
-        # 썸네일 생성 결과 처리
-        if isinstance(thumbnail_result, Exception):
-            print(f"썸네일 생성 실패: {thumbnail_result}")
-            thumbnail_url = None
-        else:
-            thumbnail_url = f"/thumbnails/{thumbnail_name}"
-            
+        _, frames = await loop.run_in_executor(
+            None, extract_thumbnail_and_frames, file_path, 3, str(thumbnail_path)
+        )
+        thumbnail_url = f"/thumbnails/{thumbnail_name}"
     except Exception as e:
-        print(f"병렬 처리 중 오류 발생: {e}")
-        # 폴백: 순차 처리
-        text = video_to_text(file_path)
-        try:
-            create_thumbnail(file_path, str(thumbnail_path))
-            thumbnail_url = f"/thumbnails/{thumbnail_name}"
-        except Exception as thumb_e:
-            print(f"썸네일 생성 실패: {thumb_e}")
-            thumbnail_url = None
-    
-    finally:
-        executor.shutdown(wait=False)
+        print(f"썸네일 생성 실패: {e}")
+        frames = None
+        thumbnail_url = None
+
+    # 추출한 프레임으로 텍스트 생성 (추출에 실패했으면 video_to_text가 다시 시도)
+    text = await loop.run_in_executor(None, video_to_text, file_path, 3, frames)
 
     # 임베딩 생성 (텍스트 추출 완료 후 실행)
     metadata = {
         "file_name": file_name, 
         "information": text,
-        "thumbnail": thumbnail_url
+        "thumbnail": thumbnail_url,
+        **(await loop.run_in_executor(None, _media_metadata, file_path))
     }
-    ids = add_to_chroma(text, metadata)
+    ids = await loop.run_in_executor(None, add_to_chroma, text, metadata)
     
     processing_time = round(time.time() - start_time, 1)
 
@@ -159,16 +177,96 @@ async def upload_file(
     }
 
 
+def _process_video_url(url: str, file_name: str, task_id: str = None):
+    """
+    URL 비디오를 다운로드하고 텍스트 추출, 썸네일 생성, 임베딩 저장까지 처리합니다.
+
+    업로드 큐 워커 스레드에서 실행됩니다.
+    """
+    import time
+    start_time = time.time()
+
+    try:
+        file_path = UPLOAD_DIR / file_name
+
+        # 비디오 다운로드
+        download_video_from_url(url, str(file_path))
+
+        # 썸네일 경로 준비
+        thumbnail_name = f"{file_path.stem}_thumbnail.jpg"
+        thumbnail_path = THUMBNAIL_DIR / thumbnail_name
+
+        # 영상을 한 번만 디코딩해서 썸네일과 분석용 프레임을 함께 추출
+        try:
+            _, frames = extract_thumbnail_and_frames(file_path, 3, str(thumbnail_path))
+            thumbnail_url = f"/thumbnails/{thumbnail_name}"
+        except Exception as thumb_e:
+            print(f"썸네일 생성 실패: {thumb_e}")
+            frames = None
+            thumbnail_url = None
+
+        # 추출한 프레임으로 텍스트 생성 (추출에 실패했으면 video_to_text가 다시 시도)
+        text = video_to_text(file_path, 3, frames)
+
+        # 임베딩 생성 (텍스트 추출 완료 후 실행)
+        metadata = {
+            "file_name": file_name,
+            "information": text,
+            "thumbnail": thumbnail_url,
+            **_media_metadata(file_path)
+        }
+        add_to_chroma(text, metadata)
+
+        # URL 정보를 DB에 저장 (파일 기록은 백그라운드 스레드가 곧바로 처리)
+        save_video_url(url, file_name, metadata)
+
+        processing_time = round(time.time() - start_time, 1)
+
+        result = {
+            "status": "success",
+            "message": "비디오가 성공적으로 업로드되었습니다.",
+            "file_name": file_name,
+            "information": text,
+            "thumbnail": thumbnail_url,
+            "processing_time": f"{processing_time}초"
+        }
+
+        # 태스크 완료 정보 업데이트
+        if task_id:
+            update_task_info(task_id, {
+                "status": TaskStatus.COMPLETED.value,
+                "result": result
+            })
+
+        return result
+
+    except Exception as e:
+        # 태스크 실패 정보 업데이트
+        if task_id:
+            update_task_info(task_id, {
+                "status": TaskStatus.FAILED.value,
+                "error": {
+                    "message": str(e),
+                    "type": "video_upload_error"
+                }
+            })
+        raise e
+
+    finally:
+        with _pending_lock:
+            _pending_urls.pop(url, None)
+
+
 @router.post(
     "/upload_url",
-    summary="URL로 비디오 업로드 (병렬 처리)",
+    summary="URL로 비디오 업로드 (백그라운드 처리)",
     description="""
-    비디오 URL을 통해 원격 비디오를 다운로드하고 병렬 처리로 최적화된 성능을 제공합니다.
+    비디오 URL을 업로드 큐에 등록하고 즉시 태스크 ID를 반환합니다.
     
-    **병렬 처리 최적화:**
-    - 텍스트 추출과 썸네일 생성을 동시에 실행
-    - 전체 처리 시간 단축
-    - 서버 리소스 효율적 활용
+    **백그라운드 처리:**
+    - 다운로드, 텍스트 추출, 임베딩 저장은 업로드 큐 워커에서 실행
+    - 요청은 큐 등록 후 바로 응답하므로 API 서버가 막히지 않음
+    - 썸네일과 분석용 프레임은 영상을 한 번만 디코딩해서 함께 추출
     
     **중복 검증 기능:**
     - 동일한 URL이 이미 업로드된 경우 중복임을 알려줍니다
@@ -176,28 +274,29 @@ async def upload_file(
     
     **처리 과정:**
     1. URL 중복 여부 확인
-    2. 비디오 파일 다운로드
-    3. 텍스트 추출 + 썸네일 생성 (병렬 실행)
-    4. 벡터 임베딩 생성
-    5. URL 정보를 데이터베이스에 저장
+    2. 업로드 큐에 태스크 등록 후 태스크 ID 반환
+    3. (워커) 비디오 파일 다운로드
+    4. (워커) 썸네일 + 분석용 프레임 추출 (디코딩 1회)
+    5. (워커) 추출한 프레임으로 텍스트 생성
+    6. (워커) 벡터 임베딩 생성 및 URL 정보 저장
+    
+    처리 결과는 `/api/video/task/{task_id}`에서 확인할 수 있습니다.
     
     **지원 URL:** YouTube, Vimeo, 직접 비디오 링크 등
     """,
     responses={
         200: {
-            "description": "성공 또는 중복",
+            "description": "큐 등록 또는 중복",
             "content": {
                 "application/json": {
                     "examples": {
-                        "success": {
-                            "summary": "성공적인 업로드",
+                        "queued": {
+                            "summary": "업로드 큐 등록",
                             "value": {
-                                "status": "success",
-                                "message": "비디오가 성공적으로 업로드되었습니다.",
-                                "file_name": "def456_downloaded.mp4",
-                                "information": "이 영상은 Python 프로그래밍에 대해 설명합니다...",
-                                "thumbnail": "/thumbnails/def456_thumbnail.jpg",
-                                "processing_time": "8.3초"
+                                "status": "queued",
+                                "message": "비디오 업로드 작업이 큐에 추가되었습니다.",
+                                "task_id": "550e8400-e29b-41d4-a716-446655440000",
+                                "file_name": "def456_downloaded.mp4"
                             }
                         },
                         "duplicate": {
@@ -221,8 +320,7 @@ async def upload_file(
             }
         },
         400: {"description": "잘못된 URL 형식"},
-        404: {"description": "비디오를 찾을 수 없음"},
-        500: {"description": "다운로드 또는 처리 중 오류"}
+        429: {"description": "업로드 큐가 가득 참 (Retry-After 이후 재시도)"}
     }
 )
 async def upload_video_url(
@@ -232,11 +330,9 @@ async def upload_video_url(
         example="https://www.youtube.com/watch?v=dQw4w9WgXcQ"
     )
 ):
-    import time
-    start_time = time.time()
-    
     # URL 중복 검증
-    existing_record = check_url_exists(url)
+    # DB 접근은 이벤트 루프를 막지 않도록 스레드에서 실행
+    existing_record = await asyncio.to_thread(check_url_exists, url)
     if existing_record:
         return {
             "status": "duplicate",
@@ -249,69 +345,195 @@ async def upload_video_url(
         }
     
     file_name = f"{uuid.uuid4()}_downloaded.mp4"
-    file_path = UPLOAD_DIR / file_name
 
-    # 비디오 다운로드
-    download_video_from_url(url, str(file_path))
+    # 같은 URL이 이미 큐에서 처리 중인지 확인
+    with _pending_lock:
+        pending = _pending_urls.get(url)
+        if pending is None:
+            _pending_urls[url] = {"task_id": None, "file_name": file_name}
+    if pending is not None:
+        return {
+            "status": "duplicate",
+            "message": "이미 업로드 처리 중인 비디오입니다.",
+            "existing_data": dict(pending)
+        }
 
-    # 썸네일 경로 준비
-    thumbnail_name = f"{file_path.stem}_thumbnail.jpg"
-    thumbnail_path = THUMBNAIL_DIR / thumbnail_name
+    # 업로드 큐 가져오기
+    queue = get_upload_queue()
 
-    # 병렬 처리: 텍스트 추출과 썸네일 생성을 동시에 실행
-    executor = ThreadPoolExecutor(max_workers=2)
-    loop = asyncio.get_event_loop()
-    
+    # 태스크를 큐에 추가 (큐가 가득 차면 기다리지 않고 429로 응답)
     try:
-        # 텍스트 추출과 썸네일 생성을 병렬로 실행
-        text_task = loop.run_in_executor(executor, video_to_text, file_path)
-        thumbnail_task = loop.run_in_executor(executor, create_thumbnail, file_path, str(thumbnail_path))
-        
-        # 두 작업이 모두 완료될 때까지 대기
-        text, thumbnail_result = await asyncio.gather(text_task, thumbnail_task, return_exceptions=True)
-        
-        # 썸네일 생성 결과 처리
-        if isinstance(thumbnail_result, Exception):
-            print(f"썸네일 생성 실패: {thumbnail_result}")
-            thumbnail_url = None
-        else:
-            thumbnail_url = f"/thumbnails/{thumbnail_name}"
-            
-    except Exception as e:
-        print(f"병렬 처리 중 오류 발생: {e}")
-        # 폴백: 순차 처리
-        text = video_to_text(file_path)
-        try:
-            create_thumbnail(file_path, str(thumbnail_path))
-            thumbnail_url = f"/thumbnails/{thumbnail_name}"
-        except Exception as thumb_e:
-            print(f"썸네일 생성 실패: {thumb_e}")
-            thumbnail_url = None
+        task_id = queue.add_task(
+            task_func=_process_video_url,
+            task_kwargs={
+                "url": url,
+                "file_name": file_name
+            },
+            task_type="video_upload",
+            pass_task_id=True
+        )
+    except QueueFullError as e:
+        with _pending_lock:
+            _pending_urls.pop(url, None)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "60"})
+
+    with _pending_lock:
+        if url in _pending_urls:
+            _pending_urls[url]["task_id"] = task_id
+
+    # DB에 태스크 정보 저장
+    await asyncio.to_thread(save_task_info, task_id, {
+        "type": "video_upload",
+        "status": TaskStatus.PENDING.value,
+        "request_data": {"url": url, "file_name": file_name}
+    })
+
+    return {
+        "status": "queued",
+        "message": "비디오 업로드 작업이 큐에 추가되었습니다.",
+        "task_id": task_id,
+        "file_name": file_name
+    }
+
+
+@router.post(
+    "/upload_url_batch",
+    summary="여러 URL로 비디오 일괄 업로드",
+    description="""
+    여러 비디오 URL을 한 번의 요청으로 업로드 큐에 등록합니다.
     
-    finally:
-        executor.shutdown(wait=False)
+    **처리 방식:**
+    - 각 URL은 `/upload_url`과 동일하게 중복 확인 후 업로드 큐에 등록됩니다
+    - 실제 처리는 업로드 큐 워커에서 진행됩니다
+    - 일부 URL 등록이 실패해도 나머지 URL은 계속 처리됩니다
+    
+    **요청 예시:**
+    ```json
+    {
+      "urls": [
+        "https://cdn.pixabay.com/video/example1.mp4",
+        "https://cdn.pixabay.com/video/example2.mp4"
+      ]
+    }
+    ```
+    """,
+    responses={
+        200: {
+            "description": "URL별 등록 결과",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "status": "success",
+                        "count": 2,
+                        "failed": 0,
+                        "results": [
+                            {
+                                "status": "queued",
+                                "message": "비디오 업로드 작업이 큐에 추가되었습니다.",
+                                "task_id": "550e8400-e29b-41d4-a716-446655440000",
+                                "file_name": "def456_downloaded.mp4"
+                            },
+                            {
+                                "status": "duplicate",
+                                "message": "이미 업로드된 비디오입니다.",
+                                "existing_data": {
+                                    "file_name": "abc123_downloaded.mp4",
+                                    "created_at": "2024-01-15T09:30:00.123456",
+                                    "metadata": {}
+                                }
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        429: {"description": "업로드 큐가 가득 차 일부 URL만 등록됨 (Retry-After 이후 같은 배치로 재시도)"}
+    }
+)
+async def upload_video_url_batch(request: VideoUrlBatchRequest):
+    results = []
 
-    # 임베딩 생성 (텍스트 추출 완료 후 실행)
-    metadata = {
-        "file_name": file_name, 
-        "information": text,
-        "thumbnail": thumbnail_url
+    for index, url in enumerate(request.urls):
+        try:
+            results.append(await upload_video_url(url))
+        except HTTPException as e:
+            if e.status_code != 429:
+                print(f"URL 업로드 등록 실패: {url} - {e.detail}")
+                results.append({"status": "error", "url": url, "message": str(e.detail)})
+                continue
+            # 큐가 가득 차면 남은 URL은 등록하지 않고 429로 응답
+            # (이미 등록된 URL은 재시도 시 중복으로 처리되므로 클라이언트는 배치를 그대로 다시 보내면 됨)
+            raise HTTPException(
+                status_code=429,
+                detail=f"업로드 큐가 가득 찼습니다. {index}개 URL만 등록되었습니다. (요청 {len(request.urls)}개)",
+                headers={"Retry-After": "60"}
+            )
+        except Exception as e:
+            print(f"URL 업로드 등록 실패: {url} - {e}")
+            results.append({"status": "error", "url": url, "message": str(e)})
+
+    return {
+        "status": "success",
+        "count": len(results),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "results": results
     }
-    ids = add_to_chroma(text, metadata)
-    print(ids)
 
-    # URL 정보를 DB에 저장
-    save_video_url(url, file_name, metadata)
+
+@router.get(
+    "/task/{task_id}",
+    summary="URL 업로드 태스크 상태 조회",
+    description="""
+    `/upload_url` 또는 `/upload_url_batch`로 등록된 업로드 태스크의 상태를 조회합니다.
     
-    processing_time = round(time.time() - start_time, 1)
+    **태스크 상태:**
+    - **pending**: 큐에서 대기 중
+    - **completed**: 처리 완료 (`result`에 업로드 결과 포함)
+    - **failed**: 처리 실패 (`error`에 에러 메시지 포함)
+    """,
+    responses={
+        200: {
+            "description": "태스크 정보",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "status": "success",
+                        "task": {
+                            "task_id": "550e8400-e29b-41d4-a716-446655440000",
+                            "type": "video_upload",
+                            "status": "completed",
+                            "created_at": "2024-01-15T09:30:00.123456",
+                            "updated_at": "2024-01-15T09:30:08.654321",
+                            "request_data": {
+                                "url": "https://cdn.pixabay.com/video/example1.mp4",
+                                "file_name": "def456_downloaded.mp4"
+                            },
+                            "result": {
+                                "status": "success",
+                                "message": "비디오가 성공적으로 업로드되었습니다.",
+                                "file_name": "def456_downloaded.mp4",
+                                "information": "이 영상은 Python 프로그래밍에 대해 설명합니다...",
+                                "thumbnail": "/thumbnails/def456_thumbnail.jpg",
+                                "processing_time": "8.3초"
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        404: {"description": "태스크를 찾을 수 없음"}
+    }
+)
+def get_upload_task(task_id: str):
+    """업로드 태스크 정보를 DB에서 가져옵니다."""
+    task = get_task_info(task_id)
+
+    if not task:
+        raise HTTPException(status_code=404, detail="해당 태스크를 찾을 수 없습니다.")
 
     return {
         "status": "success",
-        "message": "비디오가 성공적으로 업로드되었습니다.",
-        "file_name": file_name, 
-        "information": text,
-        "thumbnail": thumbnail_url,
-        "processing_time": f"{processing_time}초"
+        "task": task
     }
 
 
@@ -361,28 +583,30 @@ async def upload_video_url(
         404: {"description": "검색 결과 없음"}
     }
 )
-def search_file(
+async def search_file(
     text: str = Query(
         ..., 
         description="검색할 키워드나 문장",
         example="Python 프로그래밍 기초",
         min_length=1
+    ),
+    diverse: bool = Query(
+        False,
+        description="true이면 서로 비슷한 결과를 줄이고 다양한 결과를 반환 (MMR)"
     )
 ):
-    results = search_chroma(text)
+    # 임베딩 API 호출과 ChromaDB 조회는 블로킹 작업이므로 스레드풀에서 실행
+    search = search_chroma_mmr if diverse else search_chroma
+    results = await asyncio.get_running_loop().run_in_executor(None, search, text)
 
     # 결과 가공
-    processed_results = []
-
-    for i in range(len(results["documents"][0])):
-        processed_results.append(
-            {
-                "metadata": results["metadatas"][0][i],
-                "distance": results["distances"][0][i],
-            }
-        )
+    metadatas = results["metadatas"][0]
+    distances = results["distances"][0]
 
-    return processed_results 
+    return [
+        {"metadata": metadata, "distance": distance}
+        for metadata, distance in zip(metadatas, distances)
+    ]
 
 @router.get(
     "/urls",
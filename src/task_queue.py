@@ -8,7 +8,7 @@
 - 📊 실시간 태스크 상태 추적
 - 🛡️ 에러 처리 및 재시도 로직
 - 💾 태스크 결과 영구 저장
-- 🚀 백그라운드 워커 스레드
+- 🚀 백그라운드 워커 스레드 (큐별 워커 수 지정 가능)
 
 ## 태스크 상태
 - PENDING: 대기 중
@@ -32,30 +32,41 @@ class TaskStatus(Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class QueueFullError(Exception):
+    """대기 중인 태스크 수가 큐의 최대 크기에 도달해 새 태스크를 받을 수 없을 때 발생합니다."""
+
 class TaskQueue:
-    def __init__(self):
-        self.task_queue = queue.Queue()
+    def __init__(self, num_workers: int = 1, maxsize: int = 0):
+        # maxsize가 0이면 크기 제한 없음
+        self.task_queue = queue.Queue(maxsize=maxsize)
+        self.maxsize = maxsize
         self.tasks: Dict[str, Dict[str, Any]] = {}
-        self.worker_thread = None
+        self.num_workers = num_workers
+        self.worker_threads = []
         self.is_running = False
         self._lock = threading.Lock()
         
     def start_worker(self):
-        """백그라운드 워커 스레드를 시작합니다."""
-        if self.worker_thread is None or not self.worker_thread.is_alive():
+        """백그라운드 워커 스레드들을 시작합니다."""
+        self.worker_threads = [t for t in self.worker_threads if t.is_alive()]
+        if len(self.worker_threads) < self.num_workers:
             self.is_running = True
-            self.worker_thread = threading.Thread(target=self._worker, daemon=True)
-            self.worker_thread.start()
-            print("🚀 태스크 워커가 시작되었습니다.")
+            for _ in range(self.num_workers - len(self.worker_threads)):
+                worker_thread = threading.Thread(target=self._worker, daemon=True)
+                worker_thread.start()
+                self.worker_threads.append(worker_thread)
+            print(f"🚀 태스크 워커가 시작되었습니다. (워커 수: {self.num_workers})")
     
     def stop_worker(self):
-        """백그라운드 워커 스레드를 중지합니다."""
+        """백그라운드 워커 스레드들을 중지합니다."""
         self.is_running = False
-        if self.worker_thread and self.worker_thread.is_alive():
-            self.worker_thread.join(timeout=5)
+        alive_threads = [t for t in self.worker_threads if t.is_alive()]
+        for worker_thread in alive_threads:
+            worker_thread.join(timeout=5)
+        if alive_threads:
             print("⏹️ 태스크 워커가 중지되었습니다.")
     
-    def add_task(self, task_func: Callable, task_args: tuple = (), task_kwargs: dict = None, task_type: str = "video_generation") -> str:
+    def add_task(self, task_func: Callable, task_args: tuple = (), task_kwargs: dict = None, task_type: str = "video_generation", pass_task_id: bool = False) -> str:
         """
         새로운 태스크를 큐에 추가합니다.
         
@@ -64,11 +75,19 @@ class TaskQueue:
             task_args: 함수 인자 (tuple)
             task_kwargs: 함수 키워드 인자 (dict)
             task_type: 태스크 타입
+            pass_task_id: True이면 생성된 태스크 ID를 task_kwargs["task_id"]로 함께 전달
+                (큐에 넣기 전에 설정하므로 워커가 항상 ID를 받음)
             
         Returns:
             str: 생성된 태스크 ID
+            
+        Raises:
+            QueueFullError: 큐가 가득 찬 경우 (호출한 쪽이 기다리지 않도록 바로 발생)
         """
         task_id = str(uuid.uuid4())
+        task_kwargs = dict(task_kwargs or {})
+        if pass_task_id:
+            task_kwargs["task_id"] = task_id
         
         with self._lock:
             task_info = {
@@ -83,11 +102,14 @@ class TaskQueue:
                 "error": None,
                 "func": task_func,
                 "args": task_args or (),
-                "kwargs": task_kwargs or {}
+                "kwargs": task_kwargs
             }
             
+            try:
+                self.task_queue.put_nowait(task_id)
+            except queue.Full:
+                raise QueueFullError(f"태스크 큐가 가득 찼습니다. (최대 {self.maxsize}개)")
             self.tasks[task_id] = task_info
-            self.task_queue.put(task_id)
             
         # 워커가 실행 중이 아니면 시작
         if not self.is_running:
@@ -191,6 +213,16 @@ class TaskQueue:
 # 전역 태스크 큐 인스턴스
 task_queue = TaskQueue()
 
+# 업로드 큐에 대기할 수 있는 최대 태스크 수 (넘으면 업로드 API가 429로 응답해 클라이언트가 나중에 재시도)
+UPLOAD_QUEUE_MAXSIZE = 100
+
+# URL 비디오 업로드 전용 큐 (다운로드/텍스트 추출은 비디오 생성보다 가벼워 여러 워커로 처리)
+upload_queue = TaskQueue(num_workers=4, maxsize=UPLOAD_QUEUE_MAXSIZE)
+
 def get_task_queue() -> TaskQueue:
     """전역 태스크 큐 인스턴스를 반환합니다."""
-    return task_queue 
\ No newline at end of file
+    return task_queue
+
+def get_upload_queue() -> TaskQueue:
+    """URL 비디오 업로드 큐 인스턴스를 반환합니다."""
+    return upload_queue